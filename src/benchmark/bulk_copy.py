@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+"""Compare bulk and tag by tag copying of metadata to new sidecars.
+
+usage: python -m benchmark.bulk_copy [options]
+
+Camera files usually have far more metadata than the synthetic
+corpus, so use --source with a real photograph (ideally one with a
+large MakerNote) to get representative results.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+from optparse import OptionParser
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from photini.metadata import MetadataHandler
+from .corpus import make_corpus
+
+class TagByTagHandler(MetadataHandler):
+    # never use the bulk copy mechanism
+    def _bulk_copy(self, other):
+        return False
+
+def new_sidecar(path):
+    sc_path = path + '.xmp'
+    with open(sc_path, 'w') as of:
+        of.write('<x:xmpmeta x:xmptk="XMP Core 4.4.0-Exiv2" ')
+        of.write('xmlns:x="adobe:ns:meta/">\n')
+        of.write('</x:xmpmeta>')
+    return sc_path
+
+def time_copies(paths, handler_class):
+    """Copy every file's metadata to a new sidecar.
+
+    Returns elapsed time in seconds and a list of the sidecars' tags.
+
+    """
+    start = time.time()
+    for path in paths:
+        image_md = MetadataHandler(path)
+        sc_md = handler_class(new_sidecar(path))
+        sc_md.copy(image_md, comment=False)
+        sc_md.save_file(sc_md._path)
+    elapsed = time.time() - start
+    tags = []
+    for path in paths:
+        sc_md = MetadataHandler(path + '.xmp')
+        tags.append(sorted(
+            (tag, sc_md.get_tag_multiple(tag)) for tag in sc_md.get_xmp_tags()))
+        os.unlink(path + '.xmp')
+    return elapsed, tags
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(
+        description='Compare bulk and tag by tag metadata copying speed')
+    parser.add_option('-n', '--count', type='int', default=200,
+                      help='number of files to copy (default 200)')
+    parser.add_option('-s', '--source', metavar='PATH',
+                      help='image file to copy (default synthetic JPEG)')
+    parser.add_option('-d', '--dir', metavar='PATH',
+                      help='directory to use for files (default temporary)')
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+    root = options.dir or tempfile.mkdtemp(prefix='photini_bench_')
+    try:
+        paths = make_corpus(
+            tempfile.mkdtemp(prefix='copy', dir=root), options.count,
+            source=options.source)
+        md = MetadataHandler(paths[0])
+        print('{:d} tags per file'.format(len(
+            md.get_exif_tags() + md.get_iptc_tags() + md.get_xmp_tags())))
+        results = {}
+        for name, handler_class in (('tag', TagByTagHandler),
+                                    ('bulk', MetadataHandler)):
+            elapsed, results[name] = time_copies(paths, handler_class)
+            print('{:6s}: {:d} files in {:.2f} s ({:.1f} files/s)'.format(
+                name, len(paths), elapsed, len(paths) / elapsed))
+        if results['tag'] != results['bulk']:
+            print('WARNING: sidecars differ')
+            return 1
+    finally:
+        if not options.dir:
+            shutil.rmtree(root)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
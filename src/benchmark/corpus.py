@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+from __future__ import unicode_literals
+
+import os
+import random
+import shutil
+
+from photini.metadata import MetadataHandler
+from photini.pyqt import QtGui
+
+def make_jpeg(path, width=3000, height=2000, seed=0):
+    """Write a JPEG image of random rectangles, with no metadata."""
+    make_image(path, 'jpeg', width, height, seed)
+
+def make_tiff(path, width=3000, height=2000, seed=0):
+    """Write a TIFF image of random rectangles, with no metadata."""
+    make_image(path, 'tiff', width, height, seed)
+
+def make_image(path, fmt, width, height, seed):
+    rng = random.Random(seed)
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(128, 128, 128).rgb())
+    painter = QtGui.QPainter(image)
+    for n in range(500):
+        w = rng.randint(1, width // 4)
+        h = rng.randint(1, height // 4)
+        painter.fillRect(
+            rng.randrange(width - w), rng.randrange(height - h), w, h,
+            QtGui.QColor(rng.randrange(256), rng.randrange(256),
+                         rng.randrange(256)))
+    painter.end()
+    if not image.save(path, fmt, 90):
+        raise RuntimeError('Failed to write ' + path)
+
+def add_metadata(path):
+    """Give an image some typical camera and descriptive metadata."""
+    md = MetadataHandler(path)
+    md.set_tag_string('Exif.Image.Model', 'Benchmark camera')
+    md.set_tag_string('Exif.Image.Orientation', '1')
+    md.set_tag_string('Exif.Photo.DateTimeOriginal', '2015:10:01 12:00:00')
+    md.set_tag_string('Exif.Photo.FNumber', '28/10')
+    md.set_tag_string('Exif.Photo.FocalLength', '50/1')
+    md.set_tag_string('Xmp.dc.title', 'Benchmark image')
+    md.set_tag_multiple('Xmp.dc.subject', ['benchmark', 'photini'])
+    md.set_tag_multiple('Iptc.Application2.Keywords', ['benchmark', 'photini'])
+    md.save_file(path)
+
+def make_corpus(directory, count, source=None, width=3000, height=2000):
+    """Fill directory with count copies of an image.
+
+    If source is None a synthetic JPEG is used. Returns a list of the
+    new files' paths.
+
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if source:
+        ext = os.path.splitext(source)[1]
+    else:
+        ext = '.jpg'
+    master = os.path.join(directory, 'master' + ext)
+    if source:
+        shutil.copyfile(source, master)
+    else:
+        make_jpeg(master, width, height)
+        add_metadata(master)
+    result = []
+    for n in range(count):
+        path = os.path.join(directory, 'image_{:06d}{}'.format(n, ext))
+        shutil.copyfile(master, path)
+        result.append(path)
+    os.unlink(master)
+    return result
+
+# Tags written to every file in a "mixed" corpus. The conflicts dict
+# below adds or overwrites tags to create each kind of conflict.
+_base_tags = {
+    'Exif.GPSInfo.GPSLatitude'       : '51/1 30/1 0/1',
+    'Exif.GPSInfo.GPSLatitudeRef'    : 'N',
+    'Exif.GPSInfo.GPSLongitude'      : '0/1 6/1 0/1',
+    'Exif.GPSInfo.GPSLongitudeRef'   : 'W',
+    'Exif.Image.Artist'              : 'A N Other',
+    'Exif.Image.Copyright'           : 'Copyright 2015 A N Other',
+    'Exif.Image.DateTime'            : '2015:10:02 09:00:00',
+    'Exif.Image.ImageDescription'    : 'A benchmark image',
+    'Exif.Image.Model'               : 'Benchmark camera',
+    'Exif.Image.Orientation'         : '1',
+    'Exif.Image.ProcessingSoftware'  : 'Benchmark v1',
+    'Exif.Photo.ApertureValue'       : '297/100',
+    'Exif.Photo.DateTimeDigitized'   : '2015:10:01 12:00:00',
+    'Exif.Photo.DateTimeOriginal'    : '2015:10:01 12:00:00',
+    'Exif.Photo.FNumber'             : '28/10',
+    'Exif.Photo.FocalLength'         : '50/1',
+    'Exif.Photo.LensMake'            : 'Benchmark optics',
+    'Exif.Photo.LensModel'           : 'Benchmark zoom',
+    'Exif.Photo.LensSerialNumber'    : '12345678',
+    'Exif.Photo.LensSpecification'   : '24/1 70/1 28/10 28/10',
+    'Iptc.Application2.Byline'       : ['A N Other'],
+    'Iptc.Application2.Caption'      : ['A benchmark image'],
+    'Iptc.Application2.DateCreated'  : ['2015-10-01'],
+    'Iptc.Application2.Keywords'     : ['benchmark', 'photini'],
+    'Iptc.Application2.ObjectName'   : ['Benchmark image'],
+    'Iptc.Application2.TimeCreated'  : ['12:00:00+00:00'],
+    'Xmp.dc.creator'                 : ['A N Other'],
+    'Xmp.dc.description'             : 'A benchmark image',
+    'Xmp.dc.rights'                  : 'Copyright 2015 A N Other',
+    'Xmp.dc.subject'                 : ['benchmark', 'photini'],
+    'Xmp.dc.title'                   : 'Benchmark image',
+    'Xmp.photoshop.DateCreated'      : '2015-10-01T12:00:00',
+    }
+
+conflicts = {
+    # no conflicts
+    'clean'     : {},
+    # secondary tags disagree with primary tags of the same family
+    'secondary' : {
+        'Exif.Image.FNumber'         : '40/10',
+        'Exif.Image.FocalLength'     : '35/1',
+        'Xmp.exif.DateTimeOriginal'  : '2015-10-01T12:00:05',
+        'Xmp.tiff.Artist'            : ['Someone Else'],
+        'Xmp.tiff.ImageDescription'  : 'Another description',
+        },
+    # families disagree, some can be merged and some can't
+    'families'  : {
+        'Iptc.Application2.Keywords' : ['benchmark', 'iptc'],
+        'Xmp.dc.creator'             : ['Someone Else'],
+        'Xmp.dc.description'         : 'Another description',
+        'Xmp.photoshop.DateCreated'  : '2015-10-01T12:00:00.5+01:00',
+        },
+    }
+
+# tags written to an XMP sidecar, disagreeing with the image file
+_sidecar_tags = {
+    'Xmp.dc.description'             : 'A sidecar description',
+    'Xmp.dc.subject'                 : ['benchmark', 'sidecar'],
+    'Xmp.dc.title'                   : 'Sidecar title',
+    'Xmp.xmp.CreateDate'             : '2015-10-01T12:00:00',
+    }
+
+def _set_tags(md, tags):
+    for tag, value in tags.items():
+        if isinstance(value, list):
+            md.set_tag_multiple(tag, value)
+        else:
+            md.set_tag_string(tag, value)
+
+def add_conflicts(path, kind):
+    """Write the base tags plus a kind of conflict to an image."""
+    tags = dict(_base_tags)
+    tags.update(conflicts[kind])
+    md = MetadataHandler(path)
+    _set_tags(md, tags)
+    md.save_file(path)
+
+def make_sidecar(path):
+    """Create an XMP sidecar for an image."""
+    sc_path = path + '.xmp'
+    with open(sc_path, 'w') as of:
+        of.write('<x:xmpmeta x:xmptk="XMP Core 4.4.0-Exiv2" ')
+        of.write('xmlns:x="adobe:ns:meta/">\n')
+        of.write('</x:xmpmeta>')
+    md = MetadataHandler(sc_path)
+    _set_tags(md, _sidecar_tags)
+    md.save_file(sc_path)
+    return sc_path
+
+def make_mixed_corpus(directory, count, width=640, height=480):
+    """Fill directory with JPEG and TIFF files, some with sidecars.
+
+    Every combination of file type, conflict kind and sidecar (with or
+    without) is made count times. Returns a list of (path, variant)
+    tuples, where variant is a string such as "jpeg.clean.sidecar".
+
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    masters = {}
+    for fmt, ext in (('jpeg', '.jpg'), ('tiff', '.tif')):
+        for kind in sorted(conflicts):
+            master = os.path.join(directory, 'master_{}{}'.format(kind, ext))
+            make_image(master, fmt, width, height, 0)
+            add_conflicts(master, kind)
+            masters[fmt, kind] = master
+    result = []
+    for (fmt, kind), master in sorted(masters.items()):
+        ext = os.path.splitext(master)[1]
+        for sidecar in (False, True):
+            variant = '.'.join((fmt, kind, ('image', 'sidecar')[sidecar]))
+            for n in range(count):
+                path = os.path.join(directory, '{}_{:06d}{}'.format(
+                    variant.replace('.', '_'), n, ext))
+                shutil.copyfile(master, path)
+                if sidecar:
+                    make_sidecar(path)
+                result.append((path, variant))
+        os.unlink(master)
+    return result
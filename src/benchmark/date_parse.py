@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+"""Time the ISO 8601 date parser.
+
+usage: python -m benchmark.date_parse [options]
+
+Times DateTime.from_ISO_8601 and a reference implementation that uses
+datetime.strptime for everything. The check that they give the same
+results is in tests.test_date_parse.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+from optparse import OptionParser
+import sys
+import timeit
+
+from photini.metadata import DateTime
+from tests.test_date_parse import reference_ISO_8601
+
+def time_parsers(count):
+    args = [('20151231', '123456.78+0100'), ('20151231', '123456'),
+            ('20151231', ''), ('2015', '')]
+    for name, func in (('strptime', reference_ISO_8601),
+                       ('memoised', DateTime.from_ISO_8601),
+                       ('fast path', DateTime._parse_ISO_8601)):
+        duration = timeit.timeit(
+            lambda: [func(*x) for x in args], number=count // len(args))
+        print('{:9s}: {:.2f} us per call'.format(
+            name, duration * 1.0e6 / count))
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(description='Time ISO 8601 parser')
+    parser.add_option('-n', '--count', type='int', default=200000,
+                      help='number of calls (default 200000)')
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+    time_parsers(options.count)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+"""Compare saving metadata directly with saving via temporary files.
+
+usage: python -m benchmark.safe_save [options]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+from optparse import OptionParser
+import shutil
+import sys
+import tempfile
+import time
+
+from photini.metadata import Metadata, SafeSaveBatch
+from .corpus import make_corpus
+
+def time_saves(paths, safe):
+    """Change and save every file. Returns elapsed time in seconds."""
+    if safe:
+        batch = SafeSaveBatch()
+    else:
+        batch = None
+    start = time.time()
+    for n, path in enumerate(paths):
+        metadata = Metadata(path, cache=None)
+        metadata.keywords = ['benchmark', 'photini', str(n)]
+        metadata.save(True, 'auto', False, batch)
+    if batch:
+        failed = batch.commit()
+        if failed:
+            print('{:d} files failed'.format(len(failed)))
+    return time.time() - start
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(
+        description='Compare direct and safe metadata saving speed')
+    parser.add_option('-n', '--count', type='int', default=200,
+                      help='number of files to save (default 200)')
+    parser.add_option('-s', '--source', metavar='PATH',
+                      help='image file to copy (default synthetic JPEG)')
+    parser.add_option('-d', '--dir', metavar='PATH',
+                      help='directory to use for files (default temporary)')
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+    root = options.dir or tempfile.mkdtemp(prefix='photini_bench_')
+    try:
+        for safe in (False, True):
+            name = ('direct', 'safe')[safe]
+            paths = make_corpus(
+                tempfile.mkdtemp(prefix=name, dir=root), options.count,
+                source=options.source)
+            elapsed = time_saves(paths, safe)
+            print('{:6s}: {:d} files in {:.2f} s ({:.1f} files/s)'.format(
+                name, len(paths), elapsed, len(paths) / elapsed))
+    finally:
+        if not options.dir:
+            shutil.rmtree(root)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+"""Time reading, merging and writing metadata over a synthetic corpus.
+
+usage: python -m benchmark.suite [options]
+
+The corpus has JPEG and TIFF files, with and without XMP sidecars, and
+with various conflicts between Exif, IPTC and XMP values (see
+corpus.conflicts). Results are printed as JSON, so they can be kept
+and compared between releases. Results can be checked against
+thresholds in a JSON file that maps result names (or fnmatch patterns)
+to maximum values, and/or against a previous results file with a
+tolerance. The exit status is 1 if any check fails.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+from collections import defaultdict
+import fnmatch
+import json
+import logging
+from optparse import OptionParser
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from photini.metadata import _data_type, Metadata, MetadataHandler
+from photini import __version__
+from .corpus import make_mixed_corpus
+
+def time_get_value(corpus, repeat):
+    """Time MetadataHandler.get_value, per value type.
+
+    Returns {type name: microseconds per call}.
+
+    """
+    elapsed = defaultdict(float)
+    calls = defaultdict(int)
+    for path, variant in corpus:
+        md = MetadataHandler(path)
+        tags = [x for x in (md.get_exif_tags() + md.get_iptc_tags() +
+                            md.get_xmp_tags()) if x in _data_type]
+        for tag in tags:
+            name = _data_type[tag].__name__
+            start = time.time()
+            for n in range(repeat):
+                md.get_value(tag)
+            elapsed[name] += time.time() - start
+            calls[name] += repeat
+    return dict((name, elapsed[name] * 1.0e6 / calls[name])
+                for name in elapsed)
+
+def time_open(corpus):
+    """Time opening files, which reads every field, per corpus variant.
+
+    Returns {variant: microseconds per file}.
+
+    """
+    elapsed = defaultdict(float)
+    count = defaultdict(int)
+    for path, variant in corpus:
+        start = time.time()
+        Metadata(path, cache=None)
+        elapsed[variant] += time.time() - start
+        count[variant] += 1
+    return dict((variant, elapsed[variant] * 1.0e6 / count[variant])
+                for variant in elapsed)
+
+def time_getattr(corpus, repeat):
+    """Time reading and merging every field of an already open file,
+    per corpus variant.
+
+    Returns {variant: microseconds per file}.
+
+    """
+    elapsed = defaultdict(float)
+    count = defaultdict(int)
+    for path, variant in corpus:
+        md = Metadata(path, cache=None)
+        for n in range(repeat):
+            # forget the values read when the file was opened, so
+            # __getattr__ reads them again
+            for name in Metadata._primary_tags:
+                delattr(md, name)
+            md._conflicts = []
+            start = time.time()
+            for name in Metadata._primary_tags:
+                getattr(md, name)
+            elapsed[variant] += time.time() - start
+            count[variant] += 1
+    return dict((variant, elapsed[variant] * 1.0e6 / count[variant])
+                for variant in elapsed)
+
+def time_save(corpus, sc_mode):
+    """Time changing and saving every file with a sidecar mode.
+
+    Returns {variant: microseconds per file}.
+
+    """
+    elapsed = defaultdict(float)
+    count = defaultdict(int)
+    for n, (path, variant) in enumerate(corpus):
+        md = Metadata(path, cache=None)
+        start = time.time()
+        md.keywords = ['benchmark', 'photini', str(n)]
+        md.save(True, sc_mode, False)
+        elapsed[variant] += time.time() - start
+        count[variant] += 1
+    return dict((variant, elapsed[variant] * 1.0e6 / count[variant])
+                for variant in elapsed)
+
+def run(root, count, repeat):
+    results = {}
+    corpus = make_mixed_corpus(os.path.join(root, 'read'), count)
+    for name, value in time_get_value(corpus, repeat).items():
+        results['get_value.' + name] = value
+    for name, value in time_open(corpus).items():
+        results['open.' + name] = value
+    for name, value in time_getattr(corpus, repeat).items():
+        results['getattr.' + name] = value
+    for sc_mode in ('auto', 'always', 'delete'):
+        corpus = make_mixed_corpus(os.path.join(root, sc_mode), count)
+        for name, value in time_save(corpus, sc_mode).items():
+            results['save.{}.{}'.format(sc_mode, name)] = value
+    return results
+
+def check(results, thresholds, baseline, tolerance):
+    """Compare results with limits. Returns a list of failure messages."""
+    failures = []
+    for name in sorted(results):
+        value = results[name]
+        for pattern in sorted(thresholds):
+            if fnmatch.fnmatchcase(name, pattern) and value > thresholds[pattern]:
+                failures.append('{}: {:.1f} > threshold {:.1f}'.format(
+                    name, value, thresholds[pattern]))
+        if name in baseline:
+            limit = baseline[name] * (1.0 + tolerance)
+            if value > limit:
+                failures.append('{}: {:.1f} > baseline {:.1f} + {:.0%}'.format(
+                    name, value, baseline[name], tolerance))
+    return failures
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(
+        description='Time Photini metadata reading, merging and writing')
+    parser.add_option('-n', '--count', type='int', default=10,
+                      help='files per corpus variant (default 10)')
+    parser.add_option('-r', '--repeat', type='int', default=20,
+                      help='repeats of each get_value call and field read'
+                      ' (default 20)')
+    parser.add_option('-d', '--dir', metavar='PATH',
+                      help='directory to use for files (default temporary)')
+    parser.add_option('-o', '--output', metavar='PATH',
+                      help='write results to PATH as well as stdout')
+    parser.add_option('-t', '--thresholds', metavar='PATH',
+                      help='JSON file of maximum values')
+    parser.add_option('-b', '--baseline', metavar='PATH',
+                      help='results file of a previous run to compare with')
+    parser.add_option('--tolerance', type='float', default=0.2,
+                      help='allowed slowdown from baseline (default 0.2)')
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+    thresholds = {}
+    if options.thresholds:
+        with open(options.thresholds) as f:
+            thresholds = json.load(f)
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)['results']
+    # only show errors, e.g. unreadable files
+    logging.basicConfig(level=logging.ERROR)
+    root = options.dir or tempfile.mkdtemp(prefix='photini_bench_')
+    try:
+        results = run(root, options.count, options.repeat)
+    finally:
+        if not options.dir:
+            shutil.rmtree(root)
+    report = {
+        'version'  : __version__,
+        'python'   : platform.python_version(),
+        'platform' : platform.platform(),
+        'count'    : options.count,
+        'units'    : 'microseconds',
+        'results'  : results,
+        }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+    failures = check(results, thresholds, baseline, options.tolerance)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+"""Measure memory used by the metadata values of many images.
+
+usage: python -m benchmark.value_memory [options]
+
+Builds the values of every Photini data field, as held by a Metadata
+object, for each of a number of images and reports the memory used.
+For comparison the same is done with values stored in a per-instance
+dict, as older versions of Photini did. Needs Python 3.4 or later.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+from datetime import datetime, timedelta
+from optparse import OptionParser
+import sys
+import tracemalloc
+
+from photini.metadata import (
+    DateTime, Int, LatLon, LensSpec, MultiString, Rational, Software, String)
+
+class DictValue(object):
+    # old style storage: instance dict holding a dict of parts
+    def __init__(self, value):
+        self.value = value
+
+
+def make_values(n):
+    """Make a set of field values, as held by one Metadata object."""
+    taken = datetime(2015, 1, 1) + timedelta(seconds=n * 7)
+    return {
+        'aperture'       : Rational('28/10'),
+        'camera_model'   : String('Camera model {:d}'.format(n % 10)),
+        'copyright'      : String('Copyright {:d} A N Other'.format(n)),
+        'creator'        : MultiString('A N Other'),
+        'date_digitised' : DateTime(taken, 6, 60),
+        'date_modified'  : DateTime(taken, 6, 60),
+        'date_taken'     : DateTime(taken, 7, 60),
+        'description'    : String('Image number {:d}'.format(n)),
+        'focal_length'   : Rational('{:d}/1'.format(24 + (n % 50))),
+        'keywords'       : MultiString('one; two; {:d}'.format(n)),
+        'latlong'        : LatLon((51.0 + (n * 1.0e-5), -0.1)),
+        'lens_make'      : String('Lens maker'),
+        'lens_model'     : String('Lens model {:d}'.format(n % 5)),
+        'lens_serial'    : String('{:08d}'.format(n)),
+        'lens_spec'      : LensSpec('24 70 28/10 28/10'),
+        'orientation'    : Int(1 + (n % 8)),
+        'software'       : Software('Photini editor v15'),
+        'title'          : String('Title {:d}'.format(n)),
+        }
+
+def make_dict_values(n):
+    """Make the same values, stored in per-instance dicts."""
+    result = {}
+    for name, value in make_values(n).items():
+        part = value.value
+        if hasattr(part, 'keys'):
+            part = dict((key, part[key]) for key in part.keys())
+        result[name] = DictValue(part)
+    return result
+
+def measure(factory, count):
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    images = [factory(n) for n in range(count)]
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(x.size_diff for x in end.compare_to(start, 'filename'))
+    del images
+    return used
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(description='Measure metadata value memory use')
+    parser.add_option('-n', '--count', type='int', default=50000,
+                      help='number of images (default 50000)')
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+    for name, factory in (('dict', make_dict_values), ('slots', make_values)):
+        used = measure(factory, options.count)
+        print('{:5s}: {:.1f} MB for {:d} images ({:.0f} bytes/image)'.format(
+            name, used / 1.0e6, options.count, used / options.count))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+"""Edit the metadata of many files without starting the GUI.
+
+Files can be given as names, wildcard patterns or directories (which
+are searched recursively) on the command line, or read from a file
+list. They are processed in parallel by a pool of worker processes,
+each of which uses the same metadata handling as the Photini editor.
+
+Metadata can be exported and imported as "JSON lines", one JSON
+object per image. Files are read, processed and written as a stream,
+so memory use does not depend on the number of files.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import codecs
+from collections import deque
+from datetime import timedelta
+import glob
+import io
+import json
+import logging
+import multiprocessing
+from optparse import OptionGroup, OptionParser
+import os
+import sys
+
+import six
+
+from .metadata import _data_type, DateTime, Metadata, MultiString
+from . import __version__
+
+_fields = sorted(Metadata._primary_tags)
+
+# file types to look for when searching directories, as in
+# pyqt.image_types but without needing Qt
+_image_types = (
+    'jpeg', 'jpg', 'exv', 'cr2', 'crw', 'mrw', 'tiff', 'tif', 'dng',
+    'nef', 'pef', 'arw', 'rw2', 'sr2', 'srw', 'orf', 'png', 'pgf',
+    'raf', 'eps', 'gif', 'psd', 'tga', 'bmp', 'jp2', 'pnm'
+    )
+
+def parse_value(name, text):
+    """Convert a command line string to a metadata value."""
+    if not text:
+        return None
+    if _data_type[name] == DateTime:
+        # accept ISO 8601 "extended" format, e.g. 2015-06-30T12:00:00+01:00
+        return DateTime.from_json(text.replace(' ', 'T'))
+    return _data_type[name](text)
+
+def parse_offset(text):
+    """Convert [-][[D:]H:]M:S to a timedelta."""
+    sign = 1
+    if text[0] in '+-':
+        if text[0] == '-':
+            sign = -1
+        text = text[1:]
+    parts = list(map(int, text.split(':')))
+    if not 2 <= len(parts) <= 4:
+        raise ValueError('unrecognised offset "{}"'.format(text))
+    parts = [0] * (4 - len(parts)) + parts
+    days, hours, minutes, seconds = parts
+    return sign * timedelta(
+        days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+def parse_assignments(values):
+    """Split a list of "field=value" strings."""
+    result = []
+    for item in values:
+        name, sep, value = item.partition('=')
+        name = name.strip()
+        if not sep or name not in _fields:
+            raise ValueError('unrecognised assignment "{}"'.format(item))
+        result.append((name, value))
+    return result
+
+def parse_fields(text, default):
+    if not text:
+        return default
+    result = [x.strip() for x in text.split(',')]
+    for name in result:
+        if name not in _fields:
+            raise ValueError('unrecognised field "{}"'.format(name))
+    return result
+
+def find_files(args, file_list):
+    """Generate file names from command line arguments and file list."""
+    if file_list:
+        for line in read_lines(file_list):
+            yield line
+    for arg in args:
+        # Windows shells don't expand wildcards
+        paths = glob.glob(arg) or [arg]
+        for path in sorted(paths):
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        ext = os.path.splitext(name)[1][1:].lower()
+                        if ext in _image_types:
+                            yield os.path.join(root, name)
+            # sidecars are processed with their images
+            elif os.path.splitext(path)[1].lower() != '.xmp':
+                yield path
+
+def read_lines(path):
+    """Generate non-blank lines from a file ("-" for stdin)."""
+    if path == '-':
+        src = sys.stdin
+    else:
+        src = io.open(path, 'r', encoding='utf-8')
+    try:
+        for line in src:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+def bounded_imap(pool, func, iterable, window):
+    """Like pool.imap, but with no more than window items in progress.
+
+    Pool.imap reads all of iterable and stores all the results it
+    hasn't yet returned, so memory use grows with the number of items.
+
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+# operations to apply to each file, set once in each worker process
+_operations = None
+
+def init_worker(operations, verbose):
+    global _operations
+    logging.basicConfig(
+        level=max(logging.ERROR - (verbose * 10), 1),
+        format='%(processName)s: %(name)s: %(message)s')
+    _operations = dict(operations)
+    # convert strings to metadata values
+    _operations['set'] = [(name, parse_value(name, value))
+                          for (name, value) in operations['set']]
+    _operations['append'] = [(name, MultiString(value))
+                             for (name, value) in operations['append']]
+    if operations['offset']:
+        _operations['offset'] = parse_offset(operations['offset'])
+
+def check_file(path):
+    """Get an error message if path isn't a readable file, else None."""
+    if not os.path.exists(path):
+        return 'file not found'
+    if not os.path.isfile(path):
+        return 'not a file'
+    if not os.access(path, os.R_OK):
+        return 'file not readable'
+    return None
+
+def read_copy_values(path, fields):
+    """Get (name, value) pairs of fields in path that have a value."""
+    error = check_file(path)
+    if error:
+        raise ValueError('{}: {}'.format(path, error))
+    source = Metadata(path, cache=None)
+    result = []
+    for name in fields:
+        value = getattr(source, name)
+        if value:
+            result.append((name, value))
+    return result
+
+def process_file(item):
+    """Apply the operations to one file.
+
+    item is a file name, or a JSON object with a "path" member if
+    importing. Returns a tuple of (path, error message, saved flag,
+    exported lines).
+
+    """
+    ops = _operations
+    path = item
+    exported = []
+    try:
+        if ops['import']:
+            record = json.loads(item)
+            path = record.pop('path')
+        # don't let Metadata open (or create a sidecar for) a bad path
+        error = check_file(path)
+        if error:
+            return path, error, False, exported
+        md = Metadata(path, cache=None)
+        if ops['import']:
+            for name, value in record.items():
+                if name not in _fields:
+                    raise ValueError('unrecognised field "{}"'.format(name))
+                if value is not None:
+                    value = _data_type[name].from_json(value)
+                setattr(md, name, value)
+        for name, value in ops['copy']:
+            setattr(md, name, value)
+        for name, value in ops['set']:
+            setattr(md, name, value)
+        for name, value in ops['append']:
+            old_value = getattr(md, name)
+            if old_value:
+                value = MultiString(old_value.value + value.value)
+            setattr(md, name, value)
+        if ops['offset']:
+            for name in ops['offset_fields']:
+                value = getattr(md, name)
+                if value:
+                    setattr(md, name, DateTime(
+                        value.value['datetime'] + ops['offset'],
+                        value.value['precision'], value.value['tz_offset']))
+        if ops['format'] == 'json' and ops['export']:
+            record = {'path': path}
+            for name in ops['export']:
+                value = getattr(md, name)
+                if value:
+                    value = value.to_json()
+                record[name] = value
+            exported.append(json.dumps(record, sort_keys=True))
+        else:
+            for name in ops['export']:
+                value = getattr(md, name)
+                if value:
+                    exported.append('{}\t{}\t{}'.format(
+                        path, name, six.text_type(value)))
+        saved = False
+        if md.changed() and not ops['dry_run']:
+            md.save(ops['if_mode'], ops['sc_mode'], ops['force_iptc'])
+            if md.changed():
+                return path, 'save failed', False, exported
+            saved = True
+    except Exception as ex:
+        return path, str(ex), False, exported
+    return path, None, saved, exported
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(
+        usage='%prog [options] file ...', version='Photini ' + __version__,
+        description='Edit metadata of many image files. Valid fields: ' +
+        ', '.join(_fields))
+    parser.add_option(
+        '-f', '--file-list', metavar='FILE',
+        help='read file names from FILE ("-" for stdin)')
+    parser.add_option(
+        '-i', '--import-json', metavar='FILE',
+        help='set fields from JSON lines in FILE ("-" for stdin), e.g. as'
+        ' written by --export with --format=json')
+    parser.add_option(
+        '-j', '--jobs', type='int', default=multiprocessing.cpu_count(),
+        help='number of worker processes (default %default)')
+    parser.add_option(
+        '-n', '--dry-run', action='store_true',
+        help='do not save any changes')
+    parser.add_option(
+        '-v', '--verbose', action='count', default=0,
+        help='increase number of logging messages')
+    group = OptionGroup(parser, 'Editing')
+    group.add_option(
+        '--set', action='append', default=[], metavar='FIELD=VALUE',
+        help='set field to value, or delete it if value is empty')
+    group.add_option(
+        '--append', action='append', default=[], metavar='FIELD=VALUE',
+        help='add ";" separated items to creator or keywords')
+    group.add_option(
+        '--offset', metavar='[-][[D:]H:]M:S',
+        help='add offset to date fields')
+    group.add_option(
+        '--offset-fields', metavar='FIELD,...',
+        help='date fields to offset (default date_taken)')
+    group.add_option(
+        '--copy-from', metavar='FILE',
+        help='copy fields from FILE')
+    group.add_option(
+        '--copy-fields', metavar='FIELD,...',
+        help='fields to copy (default all except software)')
+    parser.add_option_group(group)
+    group = OptionGroup(parser, 'Exporting')
+    group.add_option(
+        '--export', metavar='FILE',
+        help='write field values to FILE ("-" for stdout)')
+    group.add_option(
+        '--format', type='choice', choices=('text', 'json'), default='text',
+        help='export format: text ("path<tab>field<tab>value" lines) or'
+        ' json (one JSON object per file) (default %default)')
+    group.add_option(
+        '--export-fields', metavar='FIELD,...',
+        help='fields to export (default all)')
+    parser.add_option_group(group)
+    group = OptionGroup(parser, 'Saving')
+    group.add_option(
+        '--sidecar', type='choice', choices=('auto', 'always', 'delete'),
+        default='auto', help='when to use XMP sidecars: auto, always or'
+        ' delete (default %default)')
+    group.add_option(
+        '--no-image', action='store_true',
+        help='do not write to image files, only to sidecars')
+    group.add_option(
+        '--force-iptc', action='store_true',
+        help='write IPTC data even if the file has none')
+    parser.add_option_group(group)
+    options, args = parser.parse_args()
+    if options.import_json:
+        if args or options.file_list:
+            parser.error('--import-json cannot be used with other files')
+    elif not (args or options.file_list):
+        parser.error('no files specified')
+    if options.no_image and options.sidecar == 'delete':
+        parser.error('--no-image and --sidecar=delete are incompatible')
+    # check operations before starting any workers
+    try:
+        assignments = parse_assignments(options.set)
+        for name, value in assignments:
+            parse_value(name, value)
+        appends = parse_assignments(options.append)
+        for name, value in appends:
+            if _data_type[name] != MultiString:
+                raise ValueError('cannot append to "{}"'.format(name))
+        if options.offset:
+            parse_offset(options.offset)
+        offset_fields = parse_fields(options.offset_fields, ['date_taken'])
+        for name in offset_fields:
+            if _data_type[name] != DateTime:
+                raise ValueError('"{}" is not a date field'.format(name))
+        copy_values = []
+        if options.copy_from:
+            copy_fields = parse_fields(
+                options.copy_fields,
+                [x for x in _fields if x != 'software'])
+            # read the source here, as an exception in the pool
+            # initialiser would make the pool restart workers forever
+            copy_values = read_copy_values(options.copy_from, copy_fields)
+        export_fields = []
+        if options.export:
+            export_fields = parse_fields(options.export_fields, _fields)
+    except ValueError as ex:
+        parser.error(str(ex))
+    operations = {
+        'set'           : assignments,
+        'append'        : appends,
+        'offset'        : options.offset,
+        'offset_fields' : offset_fields,
+        'copy'          : copy_values,
+        'export'        : export_fields,
+        'format'        : options.format,
+        'import'        : bool(options.import_json),
+        'dry_run'       : options.dry_run,
+        'if_mode'       : not options.no_image,
+        'sc_mode'       : options.sidecar,
+        'force_iptc'    : options.force_iptc,
+        }
+    export_file = None
+    close_export = False
+    if options.export == '-':
+        export_file = sys.stdout
+        if six.PY2:
+            export_file = codecs.getwriter('utf-8')(export_file)
+    elif options.export:
+        export_file = io.open(options.export, 'w', encoding='utf-8')
+        close_export = True
+    count = 0
+    saved = 0
+    errors = 0
+    if options.import_json:
+        items = read_lines(options.import_json)
+    else:
+        items = find_files(args, options.file_list)
+    jobs = max(options.jobs, 1)
+    pool = multiprocessing.Pool(
+        jobs, initializer=init_worker, initargs=(operations, options.verbose))
+    try:
+        for path, error, file_saved, exported in bounded_imap(
+                pool, process_file, items, jobs * 16):
+            count += 1
+            if error:
+                errors += 1
+                print('{}: {}'.format(path, error), file=sys.stderr)
+            if file_saved:
+                saved += 1
+            for line in exported:
+                export_file.write(line + '\n')
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if close_export:
+            export_file.close()
+    print('{:d} files, {:d} saved, {:d} errors'.format(count, saved, errors),
+          file=sys.stderr)
+    if errors:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
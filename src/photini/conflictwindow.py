@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import io
+import os
+
+import six
+
+from .configstore import data_dir
+from .pyqt import Busy, Qt, QtGui, QtWidgets, qt_version_info
+
+class ConflictWindow(QtWidgets.QWidget):
+    # table of disagreeing metadata tags in all open images
+    def __init__(self, config_store, image_list, parent=None):
+        super(ConflictWindow, self).__init__(parent)
+        self.config_store = config_store
+        self.image_list = image_list
+        self.setWindowFlags(Qt.Window)
+        self.setWindowTitle(self.tr('Photini: metadata conflicts'))
+        self.setWindowIcon(QtGui.QIcon(os.path.join(data_dir, 'icon_48.png')))
+        self.setLayout(QtWidgets.QGridLayout())
+        self.layout().setRowStretch(0, 1)
+        self.layout().setColumnStretch(0, 1)
+        # conflicts table
+        self.headers = [
+            self.tr('Image'), self.tr('Field'), self.tr('Action'),
+            self.tr('Used tag'), self.tr('Used value'),
+            self.tr('Other tag'), self.tr('Other value')]
+        self.table = QtWidgets.QTableWidget()
+        self.table.setColumnCount(len(self.headers))
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.setMinimumWidth(800)
+        self.table.cellDoubleClicked.connect(self.select_image)
+        self.layout().addWidget(self.table, 0, 0, 1, 4)
+        # buttons
+        self.summary = QtWidgets.QLabel()
+        self.layout().addWidget(self.summary, 1, 0)
+        refresh_button = QtWidgets.QPushButton(self.tr('Refresh'))
+        refresh_button.clicked.connect(self.refresh)
+        self.layout().addWidget(refresh_button, 1, 1)
+        save_button = QtWidgets.QPushButton(self.tr('Save'))
+        save_button.clicked.connect(self.save)
+        self.layout().addWidget(save_button, 1, 2)
+        dismiss_button = QtWidgets.QPushButton(self.tr('Dismiss'))
+        dismiss_button.clicked.connect(self.hide)
+        self.layout().addWidget(dismiss_button, 1, 3)
+        self.rows = []
+
+    def showEvent(self, event):
+        self.refresh()
+        super(ConflictWindow, self).showEvent(event)
+
+    def refresh(self):
+        merged_text = self.tr('merged')
+        ignored_text = self.tr('ignored')
+        with Busy():
+            self.rows = []
+            images = 0
+            for image in self.image_list.get_images():
+                conflicts = image.metadata.conflicts()
+                if conflicts:
+                    images += 1
+                for conflict in conflicts:
+                    if conflict.merged:
+                        action = merged_text
+                        used_value = ''
+                    else:
+                        action = ignored_text
+                        used_value = six.text_type(conflict.used_value)
+                    self.rows.append((
+                        image.path, conflict.field, action, conflict.used_tag,
+                        used_value, conflict.other_tag,
+                        six.text_type(conflict.other_value)))
+            self.table.setSortingEnabled(False)
+            self.table.clearContents()
+            self.table.setRowCount(len(self.rows))
+            for row, values in enumerate(self.rows):
+                for column, text in enumerate(values):
+                    if column == 0:
+                        item = QtWidgets.QTableWidgetItem(
+                            os.path.basename(text))
+                        item.setToolTip(text)
+                        item.setData(Qt.UserRole, text)
+                    else:
+                        item = QtWidgets.QTableWidgetItem(text)
+                    self.table.setItem(row, column, item)
+            self.table.setSortingEnabled(True)
+            self.table.resizeColumnsToContents()
+        self.summary.setText(self.tr(
+            '{0:d} conflicts in {1:d} images').format(len(self.rows), images))
+
+    def select_image(self, row, column):
+        path = self.table.item(row, 0).data(Qt.UserRole)
+        try:
+            self.image_list.select_image(path)
+        except KeyError:
+            # image has been closed
+            self.refresh()
+
+    def save(self):
+        path = QtWidgets.QFileDialog.getSaveFileName(
+            self, self.tr('Save conflict report'),
+            os.path.join(self.config_store.get('paths', 'conflicts', ''),
+                         'photini_conflicts.txt'),
+            self.tr('Text files (*.txt);;All files (*)'))
+        if qt_version_info >= (5, 0):
+            path = path[0]
+        if not path:
+            return
+        self.config_store.set('paths', 'conflicts', os.path.dirname(path))
+        # tab separated, for loading into a spreadsheet
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write('\t'.join(self.headers) + '\n')
+            for values in self.rows:
+                f.write('\t'.join(values) + '\n')
@@ -23,6 +23,7 @@ from datetime import datetime
 
 import six
 
+from .keywords import keyword_vocabulary
 from .pyqt import multiple_values, Qt, QtCore, QtGui, QtWidgets, qt_version_info
 from .spelling import SpellingHighlighter
 
@@ -105,6 +106,71 @@ class SingleLineEdit(MultiLineEdit):
         self.insertPlainText(source.text().replace('\n', ' '))
 
 
+class KeywordsEdit(SingleLineEdit):
+    # keywords are separated by ';' and each one can be auto completed
+    def __init__(self, vocabulary, *arg, **kw):
+        super(KeywordsEdit, self).__init__(*arg, **kw)
+        self.vocabulary = vocabulary
+        self.completer = QtWidgets.QCompleter([], self)
+        self.completer.setWidget(self)
+        # model is already sorted by rank and filtered by prefix
+        self.completer.setCompletionMode(
+            QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated.connect(self.insert_completion)
+
+    def _current_word(self):
+        # get start position and text of keyword being typed
+        text = self.toPlainText()[:self.textCursor().position()]
+        start = text.rfind(';') + 1
+        while start < len(text) and text[start].isspace():
+            start += 1
+        return start, text[start:]
+
+    def focusOutEvent(self, event):
+        # completer popup takes focus, but editing hasn't finished
+        if event.reason() == Qt.PopupFocusReason:
+            super(MultiLineEdit, self).focusOutEvent(event)
+            return
+        super(KeywordsEdit, self).focusOutEvent(event)
+
+    def keyPressEvent(self, event):
+        if self.completer.popup().isVisible() and event.key() in (
+                Qt.Key_Enter, Qt.Key_Return, Qt.Key_Escape,
+                Qt.Key_Tab, Qt.Key_Backtab):
+            # let the completer use these keys
+            event.ignore()
+            return
+        super(KeywordsEdit, self).keyPressEvent(event)
+        if event.text():
+            self.update_completer()
+        elif event.key() not in (Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt):
+            self.completer.popup().hide()
+
+    def update_completer(self):
+        popup = self.completer.popup()
+        start, word = self._current_word()
+        existing = [x.strip() for x in self.toPlainText().split(';')]
+        matches = [x for x in self.vocabulary.complete(word)
+                   if x not in existing]
+        if not matches:
+            popup.hide()
+            return
+        self.completer.model().setStringList(matches)
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) +
+                      popup.verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
+        popup.setCurrentIndex(self.completer.model().index(0, 0))
+
+    @QtCore.pyqtSlot(six.text_type)
+    def insert_completion(self, keyword):
+        start, word = self._current_word()
+        cursor = self.textCursor()
+        cursor.setPosition(start, QtGui.QTextCursor.KeepAnchor)
+        cursor.insertText(keyword + '; ')
+        self.setTextCursor(cursor)
+
+
 class LineEdit(QtWidgets.QLineEdit):
     def __init__(self, *arg, **kw):
         super(LineEdit, self).__init__(*arg, **kw)
@@ -174,7 +240,8 @@ class Descriptive(QtWidgets.QWidget):
         self.form.addRow(
             self.tr('Description / Caption'), self.widgets['description'])
         # keywords
-        self.widgets['keywords'] = SingleLineEdit(spell_check=True)
+        self.widgets['keywords'] = KeywordsEdit(
+            keyword_vocabulary, spell_check=True)
         self.widgets['keywords'].editingFinished.connect(self.new_keywords)
         self.form.addRow(self.tr('Keywords'), self.widgets['keywords'])
         # copyright
@@ -189,6 +256,9 @@ class Descriptive(QtWidgets.QWidget):
         self.form.addRow(self.tr('Creator / Artist'), self.widgets['creator'])
         # disable until an image is selected
         self.setEnabled(False)
+        # add keywords of newly opened images to vocabulary
+        self.vocabulary_paths = set()
+        self.image_list.image_list_changed.connect(self.update_vocabulary)
 
     def refresh(self):
         pass
@@ -197,7 +267,17 @@ class Descriptive(QtWidgets.QWidget):
         return False
 
     def shutdown(self):
-        pass
+        keyword_vocabulary.save()
+
+    @QtCore.pyqtSlot()
+    def update_vocabulary(self):
+        for image in self.image_list.get_images():
+            if image.path in self.vocabulary_paths:
+                continue
+            self.vocabulary_paths.add(image.path)
+            keywords = image.metadata.keywords
+            if keywords:
+                keyword_vocabulary.update(keywords.value)
 
     def new_title(self):
         self._new_value('title')
@@ -206,6 +286,15 @@ class Descriptive(QtWidgets.QWidget):
         self._new_value('description')
 
     def new_keywords(self):
+        if not self.widgets['keywords'].is_multiple():
+            # count keywords the user has added
+            old = set()
+            for image in self.image_list.get_selected_images():
+                if image.metadata.keywords:
+                    old.update(image.metadata.keywords.value)
+            new = [x.strip() for x in
+                   self.widgets['keywords'].get_value().split(';')]
+            keyword_vocabulary.update([x for x in new if x not in old])
         self._new_value('keywords')
 
     def new_copyright(self):
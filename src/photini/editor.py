@@ -39,6 +39,7 @@ from six.moves.urllib.parse import urlparse
 import webbrowser
 
 from .configstore import ConfigStore, data_dir
+from .conflictwindow import ConflictWindow
 from .bingmap import BingMap
 from .descriptive import Descriptive
 try:
@@ -50,13 +51,16 @@ from .googlemap import GoogleMap
 from .importer import Importer
 from .openstreetmap import OpenStreetMap
 from .imagelist import ImageList
+from .keywords import keyword_vocabulary
 from .loggerwindow import LoggerWindow
 try:
     from .picasa import PicasaUploader
 except ImportError:
     PicasaUploader = None
-from .pyqt import Qt, QtCore, QtGui, QNetworkProxy, QtWidgets, qt_version_info
+from .pyqt import (
+    Busy, Qt, QtCore, QtGui, QNetworkProxy, QtWidgets, qt_version_info)
 from .spelling import SpellingManager
+from .statswindow import StatisticsWindow
 from .technical import Technical
 from . import __version__
 
@@ -68,6 +72,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.selection = list()
         # logger window
         self.loggerwindow = LoggerWindow(verbose)
+        self.statistics_window = None
+        self.conflict_window = None
         self.logger = logging.getLogger(self.__class__.__name__)
         # config store
         self.config_store = ConfigStore('editor')
@@ -140,6 +146,11 @@ class MainWindow(QtWidgets.QMainWindow):
         close_all_action.triggered.connect(self.close_all_files)
         file_menu.addAction(close_all_action)
         file_menu.addSeparator()
+        conflicts_action = QtWidgets.QAction(
+            self.tr('Show metadata conflicts'), self)
+        conflicts_action.triggered.connect(self.show_conflicts)
+        file_menu.addAction(conflicts_action)
+        file_menu.addSeparator()
         quit_action = QtWidgets.QAction(self.tr('Quit'), self)
         quit_action.setShortcuts(
             [QtGui.QKeySequence.Quit, QtGui.QKeySequence.Close])
@@ -151,6 +162,10 @@ class MainWindow(QtWidgets.QMainWindow):
         settings_action = QtWidgets.QAction(self.tr('Settings'), self)
         settings_action.triggered.connect(self.edit_settings)
         options_menu.addAction(settings_action)
+        keywords_action = QtWidgets.QAction(
+            self.tr('Import keyword list'), self)
+        keywords_action.triggered.connect(self.import_keywords)
+        options_menu.addAction(keywords_action)
         options_menu.addSeparator()
         for tab in self.tab_list:
             name = tab['name'].replace('&', '')
@@ -193,6 +208,11 @@ class MainWindow(QtWidgets.QMainWindow):
         help_action = QtWidgets.QAction(self.tr('Photini documentation'), self)
         help_action.triggered.connect(self.open_docs)
         help_menu.addAction(help_action)
+        help_menu.addSeparator()
+        statistics_action = QtWidgets.QAction(
+            self.tr('Metadata statistics'), self)
+        statistics_action.triggered.connect(self.show_statistics)
+        help_menu.addAction(statistics_action)
         # main application area
         self.central_widget = QtWidgets.QSplitter()
         self.central_widget.setOrientation(Qt.Vertical)
@@ -224,6 +244,46 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def open_docs(self):
         webbrowser.open_new('http://photini.readthedocs.org/')
+
+    @QtCore.pyqtSlot()
+    def import_keywords(self):
+        path = QtWidgets.QFileDialog.getOpenFileName(
+            self, self.tr('Import keyword list'),
+            self.config_store.get('paths', 'keywords', ''),
+            self.tr('Text files (*.txt);;All files (*)'))
+        if qt_version_info >= (5, 0):
+            path = path[0]
+        if not path:
+            return
+        self.config_store.set('paths', 'keywords', os.path.dirname(path))
+        try:
+            with Busy():
+                count = keyword_vocabulary.import_file(path)
+                keyword_vocabulary.save()
+        except (IOError, UnicodeDecodeError) as ex:
+            QtWidgets.QMessageBox.warning(
+                self, self.tr('Photini: keyword list error'),
+                '{}: {}'.format(os.path.basename(path), str(ex)))
+            return
+        QtWidgets.QMessageBox.information(
+            self, self.tr('Photini: keyword list'),
+            self.tr('Added {0:d} new keywords, {1:d} known in total.').format(
+                count, len(keyword_vocabulary)))
+
+    @QtCore.pyqtSlot()
+    def show_conflicts(self):
+        if not self.conflict_window:
+            self.conflict_window = ConflictWindow(
+                self.config_store, self.image_list, self)
+        self.conflict_window.show()
+        self.conflict_window.raise_()
+
+    @QtCore.pyqtSlot()
+    def show_statistics(self):
+        if not self.statistics_window:
+            self.statistics_window = StatisticsWindow(self.config_store, self)
+        self.statistics_window.show()
+        self.statistics_window.raise_()
     
     def close_files(self):
         self._close_files(False)
@@ -243,12 +303,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.image_list.unsaved_files_dialog(all_files=True, with_cancel=False)
         for n in range(self.tabs.count()):
             self.tabs.widget(n).shutdown()
+        self.image_list.shutdown()
         self.loggerwindow.shutdown()
         super(MainWindow, self).closeEvent(event)
 
     def edit_settings(self):
         dialog = EditSettings(self, self.config_store)
         dialog.exec_()
+        self.image_list.new_settings()
         self.tabs.currentWidget().refresh()
 
     @QtCore.pyqtSlot()
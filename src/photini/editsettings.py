@@ -91,6 +91,18 @@ class EditSettings(QtWidgets.QDialog):
         self.write_if.setChecked(if_mode)
         self.write_if.clicked.connect(self.new_write_if)
         panel.layout().addRow(self.tr('Write to image'), self.write_if)
+        # safe file writing
+        safe_write = eval(self.config_store.get('files', 'safe_write', 'False'))
+        self.safe_write = QtWidgets.QCheckBox(self.tr('(slower)'))
+        self.safe_write.setChecked(safe_write)
+        panel.layout().addRow(
+            self.tr('Write via temporary file'), self.safe_write)
+        # watching for changes by other programs
+        watch_dirs = eval(self.config_store.get('files', 'watch_dirs', 'False'))
+        self.watch_dirs = QtWidgets.QCheckBox(self.tr('(quicker detection)'))
+        self.watch_dirs.setChecked(watch_dirs)
+        panel.layout().addRow(
+            self.tr('Watch image folders'), self.watch_dirs)
         # add panel to scroll area after its size is known
         scroll_area.setWidget(panel)
 
@@ -123,4 +135,8 @@ class EditSettings(QtWidgets.QDialog):
             sc_mode = 'delete'
         self.config_store.set('files', 'sidecar', sc_mode)
         self.config_store.set('files', 'image', str(self.write_if.isChecked()))
+        self.config_store.set(
+            'files', 'safe_write', str(self.safe_write.isChecked()))
+        self.config_store.set(
+            'files', 'watch_dirs', str(self.watch_dirs.isChecked()))
         return self.accept()
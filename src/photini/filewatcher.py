@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from collections import defaultdict, deque
+import logging
+import os
+
+from .metadata import sidecar_index
+from .pyqt import QtCore
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _get_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    result = [stat.st_size, stat.st_mtime]
+    sc_path = sidecar_index.find(path)
+    if sc_path:
+        try:
+            stat = os.stat(sc_path)
+            result += [sc_path, stat.st_size, stat.st_mtime]
+        except OSError:
+            pass
+    return tuple(result)
+
+
+class SignatureReader(QtCore.QObject):
+    # stat files in a separate thread, as it can be slow on network
+    # file systems
+    done = QtCore.pyqtSignal(int, object, object)
+
+    def __init__(self):
+        super(SignatureReader, self).__init__()
+        self.thread = QtCore.QThread()
+        self.moveToThread(self.thread)
+
+    @QtCore.pyqtSlot(int, object, object)
+    def read(self, check_id, paths, dir_mtime):
+        # a changed directory may have new or deleted sidecars
+        new_dir_mtime = {}
+        for directory in set(map(os.path.dirname, paths)):
+            if directory not in dir_mtime:
+                continue
+            mtime = _get_mtime(directory)
+            if mtime != dir_mtime[directory]:
+                sidecar_index.forget(directory)
+                new_dir_mtime[directory] = mtime
+        signatures = [(path, _get_signature(path)) for path in paths]
+        self.done.emit(check_id, signatures, new_dir_mtime)
+
+
+class ChangeDetector(QtCore.QObject):
+    """Notice when open image files are changed by other programs.
+
+    The size and modification time of each file, and of its sidecar
+    (if any), are polled a few files at a time, so the cost of polling
+    stays low when many images are open. Optionally the files'
+    directories are also watched with a QFileSystemWatcher (inotify on
+    Linux), so files that are replaced or get a new sidecar are checked
+    straight away.
+
+    Call pause() while Photini itself writes files and refresh() with
+    the written paths afterwards, so its own saves aren't reported.
+
+    The files are checked in a separate thread. Call shutdown() before
+    deleting the detector.
+
+    """
+    files_changed = QtCore.pyqtSignal(list)
+    files_removed = QtCore.pyqtSignal(list)
+    _read_signatures = QtCore.pyqtSignal(int, object, object)
+
+    # number of files checked each time the poll timer fires
+    chunk_size = 200
+
+    def __init__(self, interval=1000, watch_dirs=False, *arg, **kw):
+        super(ChangeDetector, self).__init__(*arg, **kw)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._signature = {}
+        self._dir_mtime = {}
+        self._dir_count = defaultdict(int)
+        self._cycle = deque()
+        self._in_cycle = set()
+        self._urgent = set()
+        self._paused = 0
+        # results of checks started before a pause or refresh are ignored
+        self._check_id = 0
+        self._checking = False
+        self._reader = SignatureReader()
+        self._read_signatures.connect(self._reader.read)
+        self._reader.done.connect(self._checked)
+        self._reader.thread.start()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._poll)
+        # directory events often come in bursts, so wait a little
+        self._urgent_timer = QtCore.QTimer(self)
+        self._urgent_timer.setSingleShot(True)
+        self._urgent_timer.setInterval(300)
+        self._urgent_timer.timeout.connect(self._check_urgent)
+        self._watcher = None
+        self.set_watch_dirs(watch_dirs)
+
+    def set_watch_dirs(self, watch_dirs):
+        if bool(watch_dirs) == bool(self._watcher):
+            return
+        if watch_dirs:
+            self._watcher = QtCore.QFileSystemWatcher(self)
+            self._watcher.directoryChanged.connect(self._directory_changed)
+            if self._dir_count:
+                self._watcher.addPaths(list(self._dir_count))
+        else:
+            self._watcher.deleteLater()
+            self._watcher = None
+
+    def shutdown(self):
+        self._timer.stop()
+        self._urgent_timer.stop()
+        self._reader.thread.quit()
+        self._reader.thread.wait()
+
+    def add(self, path):
+        if path in self._signature:
+            return
+        directory = os.path.dirname(path)
+        if directory not in self._dir_count:
+            self._dir_mtime[directory] = _get_mtime(directory)
+            if self._watcher:
+                self._watcher.addPath(directory)
+        self._dir_count[directory] += 1
+        self._signature[path] = _get_signature(path)
+        if path not in self._in_cycle:
+            self._in_cycle.add(path)
+            self._cycle.append(path)
+        self._start()
+
+    def remove(self, path):
+        if path not in self._signature:
+            return
+        del self._signature[path]
+        self._urgent.discard(path)
+        # path is removed from self._cycle when next polled
+        directory = os.path.dirname(path)
+        self._dir_count[directory] -= 1
+        if self._dir_count[directory] <= 0:
+            del self._dir_count[directory]
+            del self._dir_mtime[directory]
+            if self._watcher:
+                self._watcher.removePath(directory)
+        if not self._signature:
+            self._timer.stop()
+            self._cycle.clear()
+            self._in_cycle.clear()
+
+    def refresh(self, paths):
+        """Accept the current state of files, e.g. after saving them."""
+        self._check_id += 1
+        for directory in set(map(os.path.dirname, paths)):
+            if directory in self._dir_mtime:
+                sidecar_index.forget(directory)
+                self._dir_mtime[directory] = _get_mtime(directory)
+        for path in paths:
+            if path in self._signature:
+                self._signature[path] = _get_signature(path)
+                self._urgent.discard(path)
+
+    def pause(self):
+        self._check_id += 1
+        self._paused += 1
+        self._timer.stop()
+        self._urgent_timer.stop()
+
+    def resume(self):
+        self._paused = max(self._paused - 1, 0)
+        self._start()
+        if self._urgent:
+            self._urgent_timer.start()
+
+    def _start(self):
+        if self._signature and not self._paused and not self._timer.isActive():
+            self._timer.start()
+
+    @QtCore.pyqtSlot(str)
+    def _directory_changed(self, directory):
+        directory = os.path.normpath(directory)
+        for path in self._signature:
+            if os.path.dirname(path) == directory:
+                self._urgent.add(path)
+        if not self._paused:
+            self._urgent_timer.start()
+
+    @QtCore.pyqtSlot()
+    def _check_urgent(self):
+        if self._checking:
+            # try again when the current check has finished
+            self._urgent_timer.start()
+            return
+        paths = list(self._urgent)
+        self._urgent.clear()
+        self._check(paths)
+
+    @QtCore.pyqtSlot()
+    def _poll(self):
+        if self._checking:
+            return
+        paths = []
+        for i in range(min(self.chunk_size, len(self._cycle))):
+            path = self._cycle.popleft()
+            if path not in self._signature:
+                # file has been closed
+                self._in_cycle.discard(path)
+                continue
+            self._cycle.append(path)
+            paths.append(path)
+        self._check(paths)
+
+    def _check(self, paths):
+        if not paths:
+            return
+        self._checking = True
+        self._read_signatures.emit(
+            self._check_id, paths, dict(self._dir_mtime))
+
+    @QtCore.pyqtSlot(int, object, object)
+    def _checked(self, check_id, signatures, new_dir_mtime):
+        self._checking = False
+        if check_id != self._check_id or self._paused:
+            # Photini may have changed the files since the check started
+            return
+        for directory, mtime in new_dir_mtime.items():
+            if directory in self._dir_mtime:
+                self._dir_mtime[directory] = mtime
+        changed = []
+        removed = []
+        for path, signature in signatures:
+            if path not in self._signature:
+                # file has been closed
+                continue
+            if signature == self._signature[path]:
+                continue
+            self._signature[path] = signature
+            if signature is None:
+                removed.append(path)
+            else:
+                changed.append(path)
+        if removed:
+            self.logger.warning(
+                'Files no longer exist: %s', ', '.join(removed))
+            self.files_removed.emit(removed)
+        if changed:
+            self.logger.info('%d file(s) changed', len(changed))
+            self.files_changed.emit(changed)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from array import array
+import bisect
+from datetime import date
+import logging
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+_epoch = date(1970, 1, 1).toordinal()
+
+# track logs have many points per day, so cache day numbers
+_day_cache = {}
+
+def gpx_time(text):
+    """Convert a GPX time string to seconds since 1970-01-01 UTC.
+
+    GPX times are in the form YYYY-MM-DDTHH:MM:SS[.fff][Z|+HH:MM|-HH:MM].
+    Offsets in the form +HHMM or +HH are also accepted.
+
+    """
+    text = text.strip()
+    if len(text) < 19 or text[4] != '-' or text[10] not in 'Tt ':
+        raise ValueError('unrecognised time "{}"'.format(text))
+    days = _day_cache.get(text[:10])
+    if days is None:
+        days = date(int(text[0:4]), int(text[5:7]),
+                    int(text[8:10])).toordinal() - _epoch
+        _day_cache[text[:10]] = days
+    result = float((days * 86400) + (int(text[11:13]) * 3600) +
+                   (int(text[14:16]) * 60) + int(text[17:19]))
+    text = text[19:]
+    if text[:1] == '.':
+        end = 1
+        while end < len(text) and text[end].isdigit():
+            end += 1
+        result += float(text[:end])
+        text = text[end:]
+    if text and text not in 'Zz':
+        offset = text[1:].replace(':', '', 1)
+        if (text[0] not in '+-' or len(offset) not in (2, 4)
+                or not offset.isdigit()):
+            raise ValueError('unrecognised time zone "{}"'.format(text))
+        offset = (int(offset[:2]) * 3600) + (int(offset[2:] or 0) * 60)
+        if text[0] == '-':
+            result += offset
+        else:
+            result -= offset
+    return result
+
+
+class TrackLog(object):
+    """Positions from one or more GPX files, sorted by time.
+
+    Positions are stored in arrays, so a large track log uses
+    relatively little memory, and are looked up by binary search on
+    time, with linear interpolation between adjacent points.
+
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.clear()
+
+    def clear(self):
+        self._times = array(str('d'))
+        self._lats = array(str('d'))
+        self._lons = array(str('d'))
+
+    def __len__(self):
+        return len(self._times)
+
+    def load(self, path):
+        """Add the track points from a GPX file. Returns the number of
+        points added. Points that are already in the track log, e.g.
+        from loading the same file twice, are not added again."""
+        points = []
+        for event, elem in ET.iterparse(path):
+            # ignore namespace, so GPX 1.0 and 1.1 can both be read
+            if not elem.tag.endswith('trkpt'):
+                continue
+            for child in elem:
+                if child.tag.endswith('time'):
+                    try:
+                        points.append((gpx_time(child.text),
+                                       float(elem.get('lat')),
+                                       float(elem.get('lon'))))
+                    except (TypeError, ValueError) as ex:
+                        self.logger.warning('%s: %s', path, str(ex))
+                    break
+            elem.clear()
+        if not points:
+            return 0
+        # merge with existing points, sort by time and remove duplicates
+        old_count = len(self)
+        points.extend(zip(self._times, self._lats, self._lons))
+        points.sort()
+        self.clear()
+        last = None
+        for point in points:
+            if point == last:
+                continue
+            last = point
+            t, lat, lon = point
+            self._times.append(t)
+            self._lats.append(lat)
+            self._lons.append(lon)
+        return len(self) - old_count
+
+    def position(self, when, max_gap=None):
+        """Get the (lat, lon) position at time "when" (seconds since
+        1970-01-01 UTC).
+
+        Returns None if "when" is outside the track log, or is between
+        two points more than "max_gap" seconds apart.
+
+        """
+        times = self._times
+        idx = bisect.bisect_left(times, when)
+        if idx >= len(times):
+            return None
+        t1 = times[idx]
+        if t1 == when:
+            return self._lats[idx], self._lons[idx]
+        if idx == 0:
+            return None
+        t0 = times[idx - 1]
+        if max_gap is not None and t1 - t0 > max_gap:
+            return None
+        frac = (when - t0) / (t1 - t0)
+        lat0, lon0 = self._lats[idx - 1], self._lons[idx - 1]
+        lat1, lon1 = self._lats[idx], self._lons[idx]
+        # go the short way round if the track crosses 180 degrees
+        d_lon = lon1 - lon0
+        if d_lon > 180.0:
+            d_lon -= 360.0
+        elif d_lon < -180.0:
+            d_lon += 360.0
+        lon = lon0 + (frac * d_lon)
+        if lon > 180.0:
+            lon -= 360.0
+        elif lon < -180.0:
+            lon += 360.0
+        return lat0 + (frac * (lat1 - lat0)), lon
+
+    def image_position(self, date_taken, clock_offset=0, max_gap=None):
+        """Get the position at which a photograph was taken.
+
+        "date_taken" is the image's DateTime metadata value. If it has
+        a time zone offset this is used to convert it to UTC.
+        "clock_offset" is the number of seconds the camera clock is
+        ahead of UTC, after any time zone offset has been removed.
+
+        Returns None if the image's time is not known to the nearest
+        second, or no position is available.
+
+        """
+        if not date_taken or date_taken.value['precision'] < 6:
+            return None
+        value = date_taken.value['datetime']
+        days = value.toordinal() - _epoch
+        when = ((days * 86400) + (value.hour * 3600) + (value.minute * 60) +
+                value.second + (value.microsecond / 1.0e6) - clock_offset)
+        tz_offset = date_taken.value['tz_offset']
+        if tz_offset:
+            when -= tz_offset * 60
+        return self.position(when, max_gap=max_gap)
@@ -20,155 +20,158 @@
 from __future__ import unicode_literals
 
 import six
+from collections import OrderedDict
 from datetime import datetime
+from functools import partial
+import logging
 import os
+from six.moves.queue import Empty, Queue
 import subprocess
 import sys
+import threading
+import time
 from six.moves.urllib.parse import unquote
 
 import appdirs
 
-from .metadata import Metadata, MetadataHandler
+from .metadata import (
+    Metadata, MetadataHandler, SafeSaveBatch, sidecar_index)
+from .filewatcher import ChangeDetector
+from .metadatacache import metadata_cache
+from .searchindex import SearchIndex
+from .thumbcache import thumbnail_store
 from .pyqt import (
     Busy, image_types, Qt, QtCore, QtGui, QtWidgets, qt_version_info)
 
 DRAG_MIMETYPE = 'application/x-photini-image'
 
-class Image(QtWidgets.QFrame):
-    def __init__(self, path, image_list, thumb_size=80, *arg, **kw):
+# raw formats whose embedded preview is used to make a thumbnail
+RAW_TYPES = ('.arw', '.cr2', '.crw', '.dng', '.mrw', '.nef', '.orf', '.pef',
+             '.raf', '.rw2', '.sr2', '.srw')
+
+class MetadataStatus(QtCore.QObject):
+    # Qt adapter for Metadata status callbacks. Metadata may be saved
+    # in a worker thread, so use a signal to get to the GUI thread.
+    new_status = QtCore.pyqtSignal(bool)
+
+    def __init__(self, metadata, *arg, **kw):
+        super(MetadataStatus, self).__init__(*arg, **kw)
+        self.attach(metadata)
+
+    def attach(self, metadata):
+        metadata.status_callbacks.append(self.new_status.emit)
+
+
+class Image(QtCore.QObject):
+    def __init__(self, path, image_list, *arg, **kw):
         super(Image, self).__init__(*arg, **kw)
         self.path = path
         self.image_list = image_list
         self.name = os.path.splitext(os.path.basename(self.path))[0]
         self.selected = False
-        self.thumb_size = thumb_size
-        # read image
-        with open(self.path, 'rb') as pf:
-            image_data = pf.read()
+        # incremented when thumbnail needs to be decoded again
+        self.thumb_version = 0
         # read metadata
-        self.metadata = Metadata(self.path, image_data)
-        self.metadata.new_status.connect(self.show_status)
-        # make 'master' thumbnail
-        self.pixmap = QtGui.QPixmap()
-        self.pixmap.loadFromData(image_data)
-        if not self.pixmap.isNull():
-            if max(self.pixmap.width(), self.pixmap.height()) > 300:
-                # store a scaled down version of image to save memory
-                self.pixmap = self.pixmap.scaled(
-                    300, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        # sub widgets
-        layout = QtWidgets.QGridLayout()
-        layout.setSpacing(0)
-        layout.setContentsMargins(3, 3, 3, 3)
-        self.setLayout(layout)
-        self.setToolTip(self.path)
-        # label to display image
-        self.image = QtWidgets.QLabel()
-        self.image.setAlignment(Qt.AlignHCenter | Qt.AlignVCenter)
-        layout.addWidget(self.image, 0, 0, 1, 2)
-        # label to display file name
-        self.label = QtWidgets.QLabel(self.name)
-        self.label.setAlignment(Qt.AlignRight)
-        self.label.setStyleSheet("QLabel { font-size: 12px }")
-        layout.addWidget(self.label, 1, 1)
-        # label to display status
-        self.status = QtWidgets.QLabel()
-        self.status.setAlignment(Qt.AlignLeft)
-        self.status.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, self.status.sizePolicy().verticalPolicy())
-        self.status.setStyleSheet("QLabel { font-size: 12px }")
-        self.status.setFont(QtGui.QFont("Dejavu Sans"))
-        if not self.status.fontInfo().exactMatch():
-            # probably on Windows, try a different font
-            self.status.setFont(QtGui.QFont("Segoe UI Symbol"))
-        layout.addWidget(self.status, 1, 0)
-        self.setFrameStyle(QtWidgets.QFrame.Panel | QtWidgets.QFrame.Plain)
-        self.setObjectName("thumbnail")
-        self.set_selected(False)
+        self.metadata = Metadata(self.path)
+        self.metadata_status = MetadataStatus(self.metadata, self)
+        self.metadata_status.new_status.connect(self.show_status)
+
+    def read_thumbnail(self, size):
+        """Read the image file and make a correctly oriented QImage to
+        fit in a size x size square. The QImage is null if the file
+        can't be read.
+
+        This is run in ThumbnailLoader's threads, so mustn't use
+        QPixmap or any widgets.
+
+        """
+        orientation = self.metadata.orientation
+        orientation = orientation and orientation.value
+        # stored thumbnails have the saved orientation, which may not
+        # be the current one
+        if not self.metadata.changed():
+            image = thumbnail_store.get(self.path, size, orientation)
+            if image is not None:
+                return image
+        # make a thumbnail big enough to store, then scale it down
+        full_size = thumbnail_store.size_for(size)
+        image = self._decode_thumbnail(full_size, orientation)
+        if image.isNull():
+            return image
+        if not self.metadata.changed():
+            # don't share thumbnails with unsaved orientation changes
+            thumbnail_store.put(self.path, full_size, image, orientation)
+        if full_size > size:
+            image = image.scaled(
+                size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def _decode_thumbnail(self, size, orientation):
+        # use a raw file's embedded preview if it has one, otherwise
+        # read directly from the file
+        image = QtGui.QImage()
+        if os.path.splitext(self.path)[1].lower() in RAW_TYPES:
+            try:
+                data = MetadataHandler(self.path).get_preview(size)
+            except Exception as ex:
+                logging.getLogger(self.__class__.__name__).error(str(ex))
+                data = None
+            if data:
+                buf = QtCore.QBuffer()
+                buf.setData(data)
+                buf.open(QtCore.QIODevice.ReadOnly)
+                image = self._read_image(QtGui.QImageReader(buf), size)
+        if image.isNull():
+            image = self._read_image(QtGui.QImageReader(self.path), size)
+        if image.isNull():
+            return image
+        if orientation and orientation > 1:
+            # need to rotate and or reflect image
+            transform = QtGui.QTransform()
+            if orientation in (3, 4):
+                transform = transform.rotate(180.0)
+            elif orientation in (5, 6):
+                transform = transform.rotate(90.0)
+            elif orientation in (7, 8):
+                transform = transform.rotate(-90.0)
+            if orientation in (2, 4, 5, 7):
+                transform = transform.scale(-1.0, 1.0)
+            image = image.transformed(transform)
+        return image
+
+    def _read_image(self, reader, size):
+        scaled_size = reader.size()
+        if scaled_size.isValid():
+            # let the reader do the scaling as it may be able to decode
+            # at reduced size (e.g. JPEG)
+            scaled_size.scale(size, size, Qt.KeepAspectRatio)
+            reader.setScaledSize(scaled_size)
+        image = reader.read()
+        if image.isNull() or max(image.width(), image.height()) == size:
+            return image
+        return image.scaled(
+            size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def reload(self):
+        # file has been changed by another program
+        self.metadata = Metadata(self.path)
+        self.metadata_status.attach(self.metadata)
+        self.load_thumbnail()
         self.show_status(False)
-        self._set_thumb_size(self.thumb_size)
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.drag_start_pos = event.pos()
-        self.image_list.thumb_mouse_press(self.path, event)
-
-    def mouseMoveEvent(self, event):
-        if not self.image_list.drag_icon:
-            return
-        if ((event.pos() - self.drag_start_pos).manhattanLength() <
-                                    QtWidgets.QApplication.startDragDistance()):
-            return
-        paths = []
-        for image in self.image_list.get_selected_images():
-            paths.append(image.path)
-        if not paths:
-            return
-        drag = QtGui.QDrag(self)
-        drag.setPixmap(self.image_list.drag_icon)
-        drag.setHotSpot(QtCore.QPoint(
-            drag.pixmap().width() // 2, drag.pixmap().height()))
-        mimeData = QtCore.QMimeData()
-        mimeData.setData(DRAG_MIMETYPE, repr(paths).encode('utf-8'))
-        drag.setMimeData(mimeData)
-        dropAction = drag.exec_(Qt.CopyAction)
-
-    def mouseDoubleClickEvent(self, event):
-        if sys.platform.startswith('linux'):
-            subprocess.call(['xdg-open', self.path])
-        elif sys.platform.startswith('darwin'):
-            subprocess.call(['open', self.path])
-        elif sys.platform.startswith('win'):
-            subprocess.call(['start', self.path], shell=True)
 
     @QtCore.pyqtSlot(bool)
     def show_status(self, changed):
-        status = ''
-        # set 'geotagged' status
-        if self.metadata.latlong:
-            status += six.unichr(0x2690)
-        # set 'unsaved' status
-        if changed:
-            status += six.unichr(0x26A1)
-        self.status.setText(status)
+        self.image_list.image_changed(self)
         if changed:
             self.image_list.new_metadata.emit(True)
 
-    def _set_thumb_size(self, thumb_size):
-        self.thumb_size = thumb_size
-        self.image.setFixedSize(self.thumb_size, self.thumb_size)
-        margins = self.layout().contentsMargins()
-        self.setFixedWidth(self.thumb_size + margins.left() + margins.right() +
-                           (self.frameWidth() * 2))
-
-    def set_thumb_size(self, thumb_size):
-        self._set_thumb_size(thumb_size)
-        self.load_thumbnail()
-
     def load_thumbnail(self):
-        if self.pixmap.isNull():
-            self.image.setText(self.tr('Can not\nload\nimage'))
-        else:
-            pixmap = self.pixmap
-            orientation = self.metadata.orientation
-            if orientation and orientation.value > 1:
-                # need to rotate and or reflect image
-                transform = QtGui.QTransform()
-                if orientation.value in (3, 4):
-                    transform = transform.rotate(180.0)
-                elif orientation.value in (5, 6):
-                    transform = transform.rotate(90.0)
-                elif orientation.value in (7, 8):
-                    transform = transform.rotate(-90.0)
-                if orientation.value in (2, 4, 5, 7):
-                    transform = transform.scale(-1.0, 1.0)
-                pixmap = pixmap.transformed(transform)
-            self.image.setPixmap(pixmap.scaled(
-                self.thumb_size, self.thumb_size,
-                Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        # thumbnail needs redrawing, e.g. orientation has changed
+        self.thumb_version += 1
+        self.image_list.thumbnail_changed(self)
 
     def as_jpeg(self):
-        im = QtWidgets.QImage(self.path)
+        im = QtGui.QImage(self.path)
         temp_dir = appdirs.user_cache_dir('photini')
         if not os.path.isdir(temp_dir):
             os.makedirs(temp_dir)
@@ -186,24 +189,356 @@ class Image(QtWidgets.QFrame):
         return path
 
     def set_selected(self, value):
+        # ImageList repaints the thumbnails when selection changes
         self.selected = value
-        if self.selected:
-            self.setStyleSheet("#thumbnail {border: 2px solid red}")
-        else:
-            self.setStyleSheet("#thumbnail {border: 2px solid grey}")
 
     def get_selected(self):
         return self.selected
 
 
-class ScrollArea(QtWidgets.QScrollArea):
+class ThumbnailCache(object):
+    """Least recently used store of thumbnail pixmaps.
+
+    Only thumbnails that have been displayed are made, and the total
+    size of stored pixmaps is limited, so memory use doesn't depend on
+    the number of open images.
+
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._pixmaps = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _cost(pixmap):
+        return max(pixmap.width() * pixmap.height() * 4, 64)
+
+    def get(self, path):
+        pixmap = self._pixmaps.pop(path, None)
+        if pixmap is not None:
+            self._pixmaps[path] = pixmap
+        return pixmap
+
+    def put(self, path, pixmap):
+        self.discard(path)
+        self._pixmaps[path] = pixmap
+        self._bytes += self._cost(pixmap)
+        while self._bytes > self.max_bytes and len(self._pixmaps) > 1:
+            path, pixmap = self._pixmaps.popitem(last=False)
+            self._bytes -= self._cost(pixmap)
+
+    def discard(self, path):
+        pixmap = self._pixmaps.pop(path, None)
+        if pixmap is not None:
+            self._bytes -= self._cost(pixmap)
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._bytes = 0
+
+
+class ThumbnailTask(QtCore.QRunnable):
+    # decode thumbnails until the loader has no more requests
+    def __init__(self, loader):
+        super(ThumbnailTask, self).__init__()
+        self.loader = loader
+
+    def run(self):
+        while True:
+            request = self.loader.next_request()
+            if not request:
+                return
+            image, size, version = request
+            try:
+                thumb = image.read_thumbnail(size)
+            except Exception as ex:
+                self.loader.logger.exception(ex)
+                thumb = QtGui.QImage()
+            self.loader.done_request(image.path, size, version)
+            self.loader.thumbnail_ready.emit(image.path, size, version, thumb)
+
+
+class ThumbnailLoader(QtCore.QObject):
+    """Decode thumbnails with a pool of threads.
+
+    The most recent request is decoded first. Thumbnails are only
+    requested when they're painted, so the visible ones are always at
+    the front of the queue. Call clear() when the view scrolls to
+    discard requests for thumbnails that can no longer be seen.
+
+    """
+    thumbnail_ready = QtCore.pyqtSignal(object, int, int, object)
+
+    def __init__(self, *arg, **kw):
+        super(ThumbnailLoader, self).__init__(*arg, **kw)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        # path: (image, size, version), most recent last
+        self._requests = OrderedDict()
+        # path: (size, version) of thumbnails being decoded
+        self._in_progress = {}
+        self._running = 0
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(max(QtCore.QThread.idealThreadCount(), 1))
+
+    def request(self, image, size, version):
+        with self._lock:
+            if self._in_progress.get(image.path) == (size, version):
+                # already being decoded
+                return
+            self._requests.pop(image.path, None)
+            self._requests[image.path] = image, size, version
+            if self._running >= self._pool.maxThreadCount():
+                return
+            self._running += 1
+        self._pool.start(ThumbnailTask(self))
+
+    def next_request(self):
+        with self._lock:
+            if not self._requests:
+                self._running -= 1
+                return None
+            path, request = self._requests.popitem(last=True)
+            image, size, version = request
+            self._in_progress[path] = size, version
+            return request
+
+    def done_request(self, path, size, version):
+        with self._lock:
+            # a newer request for path may have started since
+            if self._in_progress.get(path) == (size, version):
+                del self._in_progress[path]
+
+    def discard(self, path):
+        with self._lock:
+            self._requests.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._pool.waitForDone()
+
+
+class ImageListModel(QtCore.QAbstractListModel):
+    # the images ImageList shows, i.e. not hidden by the filter, in
+    # display order
+    def __init__(self, image_list, *arg, **kw):
+        super(ImageListModel, self).__init__(*arg, **kw)
+        self.image_list = image_list
+        self.paths = []
+        self._rows = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        image = self.image(index)
+        if role == Qt.DisplayRole:
+            return image.name
+        if role == Qt.ToolTipRole:
+            return image.path
+        if role == Qt.DecorationRole:
+            return self.image_list.thumbnail(image)
+        return None
+
+    def flags(self, index):
+        # ImageList does its own selection
+        return Qt.ItemIsEnabled
+
+    def image(self, index):
+        return self.image_list.image[self.paths[index.row()]]
+
+    def row(self, path):
+        return self._rows.get(path)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = paths
+        self._rows = dict((path, row) for row, path in enumerate(paths))
+        self.endResetModel()
+
+    def append(self, path):
+        row = len(self.paths)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.paths.append(path)
+        self._rows[path] = row
+        self.endInsertRows()
+
+    def path_changed(self, path):
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class ThumbnailDelegate(QtWidgets.QStyledItemDelegate):
+    # width of border, and space between border and contents
+    border = 2
+    margin = 3
+
+    def __init__(self, *arg, **kw):
+        super(ThumbnailDelegate, self).__init__(*arg, **kw)
+        self.thumb_size = 80
+        self.label_font = QtGui.QFont()
+        self.label_font.setPixelSize(12)
+        self.label_metrics = QtGui.QFontMetrics(self.label_font)
+        self.status_font = QtGui.QFont("Dejavu Sans")
+        if not QtGui.QFontInfo(self.status_font).exactMatch():
+            # probably on Windows, try a different font
+            self.status_font = QtGui.QFont("Segoe UI Symbol")
+        self.status_font.setPixelSize(12)
+        self.status_metrics = QtGui.QFontMetrics(self.status_font)
+
+    def sizeHint(self, option, index):
+        extra = 2 * (self.border + self.margin)
+        return QtCore.QSize(
+            self.thumb_size + extra,
+            self.thumb_size + self.label_metrics.height() + extra)
+
+    def paint(self, painter, option, index):
+        image = index.model().image(index)
+        painter.save()
+        # border, red if selected
+        if image.selected:
+            pen = QtGui.QPen(QtGui.QColor(Qt.red))
+        else:
+            pen = QtGui.QPen(QtGui.QColor(Qt.gray))
+        pen.setWidth(self.border)
+        painter.setPen(pen)
+        painter.drawRect(option.rect.adjusted(1, 1, -1, -1))
+        inset = self.border + self.margin
+        inner = option.rect.adjusted(inset, inset, -inset, -inset)
+        # thumbnail
+        painter.setPen(option.palette.color(QtGui.QPalette.Text))
+        thumb_rect = QtCore.QRect(
+            inner.x(), inner.y(), self.thumb_size, self.thumb_size)
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is None:
+            # not decoded yet
+            painter.fillRect(
+                thumb_rect.adjusted(4, 4, -4, -4),
+                option.palette.color(QtGui.QPalette.Midlight))
+        elif pixmap.isNull():
+            painter.setFont(self.label_font)
+            painter.drawText(
+                thumb_rect, Qt.AlignCenter, self.tr('Can not\nload\nimage'))
+        else:
+            painter.drawPixmap(
+                thumb_rect.x() + (self.thumb_size - pixmap.width()) // 2,
+                thumb_rect.y() + (self.thumb_size - pixmap.height()) // 2,
+                pixmap)
+        # status symbols and file name
+        label_rect = QtCore.QRect(
+            inner.x(), thumb_rect.bottom() + 1,
+            inner.width(), self.label_metrics.height())
+        status = ''
+        # set 'geotagged' status
+        if image.metadata.latlong:
+            status += six.unichr(0x2690)
+        # set 'unsaved' status
+        if image.metadata.changed():
+            status += six.unichr(0x26A1)
+        status_width = 0
+        if status:
+            painter.setFont(self.status_font)
+            painter.drawText(label_rect, Qt.AlignLeft | Qt.AlignVCenter, status)
+            status_width = self.status_metrics.width(status)
+        painter.setFont(self.label_font)
+        name = self.label_metrics.elidedText(
+            image.name, Qt.ElideLeft, label_rect.width() - status_width)
+        painter.drawText(label_rect, Qt.AlignRight | Qt.AlignVCenter, name)
+        painter.restore()
+
+
+class ThumbnailView(QtWidgets.QListView):
     dropped_images = QtCore.pyqtSignal(list)
 
-    def __init__(self, parent=None):
-        super(ScrollArea, self).__init__(parent)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        self.setWidgetResizable(True)
+    def __init__(self, image_list, *arg, **kw):
+        super(ThumbnailView, self).__init__(*arg, **kw)
+        self.image_list = image_list
+        self.drag_start_pos = None
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setSpacing(0)
+        # all items are the same size, so layout needn't ask each one
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.Batched)
+        self.setBatchSize(1000)
+        # ImageList does its own selection and dragging
+        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setDragEnabled(False)
         self.setAcceptDrops(True)
+        self.viewport().setAcceptDrops(True)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setItemDelegate(ThumbnailDelegate(self))
+
+    def set_thumb_size(self, thumb_size):
+        self.itemDelegate().thumb_size = thumb_size
+        self.doItemsLayout()
+
+    def _path_at(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return None
+        return self.model().paths[index.row()]
+
+    def mousePressEvent(self, event):
+        path = self._path_at(event.pos())
+        if not path:
+            # clicked between thumbnails
+            self.image_list.deselect_all()
+            return
+        if event.button() == Qt.LeftButton:
+            self.drag_start_pos = event.pos()
+        self.image_list.thumb_mouse_press(path, event)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start_pos = None
+
+    def mouseMoveEvent(self, event):
+        if not self.image_list.drag_icon or self.drag_start_pos is None:
+            return
+        if not event.buttons() & Qt.LeftButton:
+            return
+        if ((event.pos() - self.drag_start_pos).manhattanLength() <
+                                    QtWidgets.QApplication.startDragDistance()):
+            return
+        self.drag_start_pos = None
+        paths = []
+        for image in self.image_list.get_selected_images():
+            paths.append(image.path)
+        if not paths:
+            return
+        drag = QtGui.QDrag(self)
+        drag.setPixmap(self.image_list.drag_icon)
+        drag.setHotSpot(QtCore.QPoint(
+            drag.pixmap().width() // 2, drag.pixmap().height()))
+        mimeData = QtCore.QMimeData()
+        mimeData.setData(DRAG_MIMETYPE, repr(paths).encode('utf-8'))
+        drag.setMimeData(mimeData)
+        dropAction = drag.exec_(Qt.CopyAction)
+
+    def mouseDoubleClickEvent(self, event):
+        path = self._path_at(event.pos())
+        if not path:
+            return
+        if sys.platform.startswith('linux'):
+            subprocess.call(['xdg-open', path])
+        elif sys.platform.startswith('darwin'):
+            subprocess.call(['open', path])
+        elif sys.platform.startswith('win'):
+            subprocess.call(['start', path], shell=True)
 
     def dropEvent(self, event):
         file_list = []
@@ -216,81 +551,93 @@ class ScrollArea(QtWidgets.QScrollArea):
         if event.mimeData().hasFormat('text/uri-list'):
             event.acceptProposedAction()
 
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasFormat('text/uri-list'):
+            event.acceptProposedAction()
 
-class FlowLayout(QtWidgets.QLayout):
-    """Left to right, top to bottom, fill available space Qt layout.
 
-    Python implementation, based on C++ example at
-    http://doc.qt.io/qt-4.8/qt-layouts-flowlayout-example.html
+class SaveWorker(QtCore.QObject):
+    image_saved = QtCore.pyqtSignal(object, bool)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, image_q, stop_event):
+        super(SaveWorker, self).__init__()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.image_q = image_q
+        self.stop_event = stop_event
+        self.thread = QtCore.QThread()
+        self.moveToThread(self.thread)
+
+    @QtCore.pyqtSlot(bool, six.text_type, bool, object)
+    def save_files(self, if_mode, sc_mode, force_iptc, batch):
+        while not self.stop_event.is_set():
+            try:
+                image = self.image_q.get_nowait()
+            except Empty:
+                break
+            try:
+                image.metadata.save(if_mode, sc_mode, force_iptc, batch)
+                OK = not image.metadata.changed()
+            except Exception as ex:
+                self.logger.exception(ex)
+                OK = False
+            self.image_saved.emit(image, OK)
+        self.finished.emit()
 
-    """
-    def __init__(self, *arg, **kw):
-        super(FlowLayout, self).__init__(*arg, **kw)
-        self.item_list = []
 
-    def addItem(self, item):
-        self.item_list.append(item)
+class SaveEngine(QtCore.QObject):
+    """Save the metadata of several images using a pool of threads.
 
-    def horizontalSpacing(self):
-        return 0
+    Each image's metadata has its own GExiv2 handlers, so workers can
+    save different images at the same time. Cancelling stops workers
+    from starting any more images, which are left unsaved.
 
-    def verticalSpacing(self):
-        return 0
+    """
+    start_workers = QtCore.pyqtSignal(bool, six.text_type, bool, object)
+    image_saved = QtCore.pyqtSignal(object, bool)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, thread_count, parent=None):
+        super(SaveEngine, self).__init__(parent)
+        self.image_q = Queue()
+        self.stop_event = threading.Event()
+        self.running = 0
+        self.workers = []
+        for n in range(thread_count):
+            worker = SaveWorker(self.image_q, self.stop_event)
+            self.start_workers.connect(worker.save_files)
+            worker.image_saved.connect(self.image_saved)
+            worker.finished.connect(self.worker_finished)
+            worker.thread.start()
+            self.workers.append(worker)
+
+    def save(self, images, if_mode, sc_mode, force_iptc, batch=None):
+        self.stop_event.clear()
+        for image in images:
+            self.image_q.put(image)
+        self.running = len(self.workers)
+        self.start_workers.emit(if_mode, sc_mode, force_iptc, batch)
 
-    def count(self):
-        return len(self.item_list)
+    @QtCore.pyqtSlot()
+    def cancel(self):
+        self.stop_event.set()
 
-    def itemAt(self, idx):
-        if idx < 0 or idx >= len(self.item_list):
-            return None
-        return self.item_list[idx]
+    @QtCore.pyqtSlot()
+    def worker_finished(self):
+        self.running -= 1
+        if self.running > 0:
+            return
+        # discard any images that weren't started
+        while not self.image_q.empty():
+            self.image_q.get_nowait()
+        self.finished.emit()
 
-    def takeAt(self, idx):
-        if idx < 0 or idx >= len(self.item_list):
-            return None
-        return self.item_list.pop(idx)
-
-    def expandingDirections(self):
-        return 0
-
-    def hasHeightForWidth(self):
-        return True
-
-    def heightForWidth(self, width):
-        return self._do_layout(QtCore.QRect(0, 0, width, 0), True)
-
-    def setGeometry(self, rect):
-        super(FlowLayout, self).setGeometry(rect)
-        self._do_layout(rect, False)
-
-    def sizeHint(self):
-        return self.minimumSize()
-
-    def minimumSize(self):
-        size = QtCore.QSize()
-        for item in self.item_list:
-            size = size.expandedTo(item.minimumSize())
-        left, top, right, bottom = self.getContentsMargins()
-        size += QtCore.QSize(left + right, top + bottom)
-        return size
-
-    def _do_layout(self, rect, test_only):
-        left, top, right, bottom = self.getContentsMargins()
-        effective_rect = rect.adjusted(left, top, -right, -bottom)
-        x = effective_rect.x()
-        y = effective_rect.y()
-        row_height = 0
-        for item in self.item_list:
-            item_size = item.sizeHint()
-            if x + item_size.width() > effective_rect.right() and row_height > 0:
-                x = effective_rect.x()
-                y += row_height
-                row_height = 0
-            if not test_only:
-                item.setGeometry(QtCore.QRect(QtCore.QPoint(x, y), item_size))
-            x += item_size.width()
-            row_height = max(row_height, item_size.height())
-        return y + row_height - rect.y() + bottom
+    def shutdown(self):
+        self.start_workers.disconnect()
+        for worker in self.workers:
+            worker.thread.quit()
+            worker.thread.wait()
+        self.workers = []
 
 
 class ImageList(QtWidgets.QWidget):
@@ -316,23 +663,31 @@ class ImageList(QtWidgets.QWidget):
         layout.setColumnStretch(3, 1)
         self.setLayout(layout)
         layout.setContentsMargins(0, 0, 0, 0)
-        # thumbnail display
-        self.scroll_area = ScrollArea()
-        self.scroll_area.dropped_images.connect(self.open_file_list)
-        layout.addWidget(self.scroll_area, 0, 0, 1, 6)
-        self.thumbnails = QtWidgets.QWidget()
-        self.thumbnails.setLayout(FlowLayout())
-        self.scroll_area.setWidget(self.thumbnails)
+        # thumbnail display, only painting the visible thumbnails
+        self.thumb_cache = ThumbnailCache()
+        self.thumb_loader = ThumbnailLoader(self)
+        thumbnail_store.start_tidy()
+        self.thumb_loader.thumbnail_ready.connect(self.thumbnail_ready)
+        self.thumbnail_model = ImageListModel(self)
+        self.thumbnails = ThumbnailView(self)
+        self.thumbnails.setModel(self.thumbnail_model)
+        self.thumbnails.set_thumb_size(self.thumb_size)
+        # thumbnails that have scrolled out of view needn't be decoded
+        self.thumbnails.verticalScrollBar().valueChanged.connect(
+            self._thumbnails_scrolled)
+        self._last_shown = 0.0
+        self.thumbnails.dropped_images.connect(self.open_file_list)
+        layout.addWidget(self.thumbnails, 0, 0, 1, 6)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToPreviousChar,
-                        self.scroll_area, self.move_to_prev_thumb)
+                        self.thumbnails, self.move_to_prev_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToNextChar,
-                        self.scroll_area, self.move_to_next_thumb)
+                        self.thumbnails, self.move_to_next_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectPreviousChar,
-                        self.scroll_area, self.select_prev_thumb)
+                        self.thumbnails, self.select_prev_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectNextChar,
-                        self.scroll_area, self.select_next_thumb)
+                        self.thumbnails, self.select_next_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectAll,
-                        self.scroll_area, self.select_all)
+                        self.thumbnails, self.select_all)
         # sort key selector
         layout.addWidget(QtWidgets.QLabel(self.tr('sort by: ')), 1, 0)
         self.sort_name = QtWidgets.QRadioButton(self.tr('file name'))
@@ -356,12 +711,43 @@ class ImageList(QtWidgets.QWidget):
         self.size_slider.setMinimumWidth(140)
         self.size_slider.valueChanged.connect(self._new_thumb_size)
         layout.addWidget(self.size_slider, 1, 5)
+        # filter
+        self.search_index = SearchIndex()
+        # paths of images hidden by the filter
+        self.hidden = set()
+        layout.addWidget(QtWidgets.QLabel(self.tr('filter: ')), 2, 0)
+        self.filter_edit = QtWidgets.QLineEdit()
+        self.filter_edit.setToolTip(self.tr(
+            'Show images with words starting with these in title,'
+            ' description, keywords, creator or camera model.\n'
+            'Use e.g. "keywords:cat" to search one field, "title:*" for'
+            ' images with any title, "-word" to exclude.'))
+        if qt_version_info >= (5, 2):
+            self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self._new_filter_text)
+        layout.addWidget(self.filter_edit, 2, 1, 1, 4)
+        self.filter_count = QtWidgets.QLabel()
+        layout.addWidget(self.filter_count, 2, 5)
+        # wait for typing to pause before filtering
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        # notice files changed by other programs
+        self.change_detector = ChangeDetector(parent=self)
+        self.change_detector.files_changed.connect(self.files_changed)
+        self.change_detector.files_removed.connect(self.files_removed)
+        self.new_settings()
+
+    def new_settings(self):
+        self.change_detector.set_watch_dirs(
+            eval(self.config_store.get('files', 'watch_dirs', 'False')))
 
     def set_drag_to_map(self, icon):
         self.drag_icon = icon
 
     def get_image(self, path):
-        if path not in self.path_list:
+        if path not in self.image:
             return None
         return self.image[path]
 
@@ -377,12 +763,51 @@ class ImageList(QtWidgets.QWidget):
                 selection.append(image)
         return selection
 
-    def mousePressEvent(self, event):
-        if self.scroll_area.underMouse():
-            self._clear_selection()
-            self.last_selected = None
-            self.selection_anchor = None
-            self.emit_selection()
+    def thumbnail(self, image):
+        # returns None if thumbnail hasn't been decoded yet
+        pixmap = self.thumb_cache.get(image.path)
+        if pixmap is None:
+            self.thumb_loader.request(
+                image, self.thumb_size, image.thumb_version)
+        return pixmap
+
+    @QtCore.pyqtSlot(object, int, int, object)
+    def thumbnail_ready(self, path, size, version, thumb):
+        image = self.image.get(path)
+        if not image:
+            return
+        if size != self.thumb_size or version != image.thumb_version:
+            # out of date, repaint to request a new one
+            self.image_changed(image)
+            return
+        self.thumb_cache.put(path, QtGui.QPixmap.fromImage(thumb))
+        self.image_changed(image)
+
+    @QtCore.pyqtSlot(int)
+    def _thumbnails_scrolled(self, value):
+        self.thumb_loader.clear()
+        # scrolling only repaints newly exposed items, so repaint the
+        # rest to request any of them that are still needed
+        self.thumbnails.viewport().update()
+
+    def thumbnail_changed(self, image):
+        self.thumb_loader.discard(image.path)
+        self.thumb_cache.discard(image.path)
+        self.image_changed(image)
+
+    def shutdown(self):
+        self.change_detector.shutdown()
+        self.thumb_loader.shutdown()
+        metadata_cache.prune()
+
+    def image_changed(self, image):
+        self.thumbnail_model.path_changed(image.path)
+
+    def deselect_all(self):
+        self._clear_selection()
+        self.last_selected = None
+        self.selection_anchor = None
+        self.emit_selection()
 
     @QtCore.pyqtSlot()
     def open_files(self):
@@ -403,23 +828,79 @@ class ImageList(QtWidgets.QWidget):
     @QtCore.pyqtSlot(list)
     def open_file_list(self, path_list):
         with Busy():
+            # re-read directories in case sidecars have been added
+            for directory in set(map(os.path.dirname, path_list)):
+                sidecar_index.forget(os.path.normpath(directory))
             for path in path_list:
                 self.open_file(path)
         self.done_opening(path_list[-1])
 
     def open_file(self, path):
         path = os.path.normpath(path)
-        if path in self.path_list:
+        if path in self.image:
             return
         self.path_list.append(path)
-        image = Image(path, self, thumb_size=self.thumb_size)
+        image = Image(path, self)
         self.image[path] = image
+        self._index_image(image)
+        self.change_detector.add(path)
         self.show_thumbnail(image)
 
+    def _index_image(self, image):
+        self.search_index.add(image.path, image.metadata)
+        image.metadata.field_callbacks.append(
+            partial(self.search_index.update_field, image.path))
+
     def done_opening(self, path):
+        metadata_cache.flush()
         self.config_store.set('paths', 'images', os.path.dirname(path))
+        self.apply_filter()
         self._sort_thumbnails()
 
+    @QtCore.pyqtSlot()
+    def _new_filter_text(self):
+        self.filter_timer.start()
+
+    @QtCore.pyqtSlot()
+    def apply_filter(self):
+        self.filter_timer.stop()
+        matches = self.search_index.search(self.filter_edit.text())
+        hidden = set()
+        if matches is not None:
+            hidden = set(x for x in self.path_list if x not in matches)
+        selection_changed = False
+        for path in hidden:
+            image = self.image[path]
+            if image.get_selected():
+                # don't let hidden images be edited
+                image.set_selected(False)
+                selection_changed = True
+        if hidden != self.hidden:
+            self.hidden = hidden
+            self._show_thumbnails()
+        if self.last_selected in self.hidden:
+            self.last_selected = None
+        if self.selection_anchor in self.hidden:
+            self.selection_anchor = None
+        if matches is None:
+            self.filter_count.clear()
+        else:
+            self.filter_count.setText(self.tr('{0:d} of {1:d}').format(
+                len(matches), len(self.path_list)))
+        if selection_changed:
+            self.emit_selection()
+
+    def _visible_paths(self):
+        return [x for x in self.path_list if x not in self.hidden]
+
+    def _show_thumbnails(self):
+        self.thumbnail_model.set_paths(self._visible_paths())
+
+    def _scroll_to(self, path):
+        row = self.thumbnail_model.row(path)
+        if row is not None:
+            self.thumbnails.scrollTo(self.thumbnail_model.index(row))
+
     def _date_key(self, idx):
         result = self.image[idx].metadata.date_taken
         if result is None:
@@ -443,48 +924,187 @@ class ImageList(QtWidgets.QWidget):
                 self.path_list.sort(key=self._date_key)
             else:
                 self.path_list.sort()
-            for path in self.path_list:
-                self.show_thumbnail(self.image[path], False)
+            self._show_thumbnails()
         if self.last_selected:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(self.image[self.last_selected])
+            self._scroll_to(self.last_selected)
         self.image_list_changed.emit()
 
     def show_thumbnail(self, image, live=True):
-        self.thumbnails.layout().addWidget(image)
-        if live:
-            self.app.processEvents()
-        image.load_thumbnail()
-        if live:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(image)
-            self.app.processEvents()
+        self.thumbnail_model.append(image.path)
+        if not live:
+            return
+        # update display a few times a second while opening many files
+        now = time.time()
+        if now - self._last_shown < 0.2:
+            return
+        self._last_shown = now
+        self._scroll_to(image.path)
+        self.app.processEvents()
 
     def close_files(self, all_files):
-        layout = self.thumbnails.layout()
-        for path in list(self.path_list):
-            image = self.image[path]
-            if all_files or image.get_selected():
-                self.path_list.remove(path)
-                del self.image[path]
-                layout.removeWidget(image)
-                image.setParent(None)
+        self._close_paths([x for x in self.path_list
+                           if all_files or self.image[x].get_selected()])
+
+    def _close_paths(self, paths):
+        for path in paths:
+            del self.image[path]
+            self.search_index.remove(path)
+            self.change_detector.remove(path)
+            self.thumb_loader.discard(path)
+            self.thumb_cache.discard(path)
+            self.hidden.discard(path)
+        self.path_list = [x for x in self.path_list if x in self.image]
+        self._show_thumbnails()
         self.last_selected = None
         self.selection_anchor = None
         self.emit_selection()
         self.image_list_changed.emit()
 
+    @QtCore.pyqtSlot(list)
+    def files_removed(self, paths):
+        paths = [x for x in paths if x in self.image]
+        unsaved = [x for x in paths if self.image[x].metadata.changed()]
+        if unsaved:
+            # don't let the detector open more dialogs while this one is open
+            self.change_detector.pause()
+            dialog = QtWidgets.QMessageBox(self)
+            dialog.setWindowTitle(self.tr('Photini: files deleted'))
+            dialog.setText(self.tr(
+                '<h3>Some images with unsaved metadata have been deleted'
+                ' by another program.</h3>'))
+            dialog.setInformativeText(self.tr(
+                'Do you want to close them and lose your changes? If not,'
+                ' they stay open in case the files are restored.'))
+            dialog.setDetailedText('\n'.join(unsaved))
+            dialog.setIcon(QtWidgets.QMessageBox.Warning)
+            dialog.setStandardButtons(
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+            dialog.setDefaultButton(QtWidgets.QMessageBox.No)
+            result = dialog.exec_()
+            self.change_detector.resume()
+            if result != QtWidgets.QMessageBox.Yes:
+                paths = [x for x in paths if x not in unsaved]
+            # files may have been closed while the dialog was open
+            paths = [x for x in paths if x in self.image]
+        if not paths:
+            return
+        self._close_paths(paths)
+        unsaved = False
+        for path in self.path_list:
+            unsaved = unsaved or self.image[path].metadata.changed()
+        self.new_metadata.emit(unsaved)
+
+    @QtCore.pyqtSlot(list)
+    def files_changed(self, paths):
+        unsaved = [x for x in paths if self.image[x].metadata.changed()]
+        if unsaved:
+            # don't let the detector open more dialogs while this one is open
+            self.change_detector.pause()
+            dialog = QtWidgets.QMessageBox(self)
+            dialog.setWindowTitle(self.tr('Photini: files changed'))
+            dialog.setText(self.tr(
+                '<h3>Some images with unsaved metadata have been changed'
+                ' by another program.</h3>'))
+            dialog.setInformativeText(self.tr(
+                'Do you want to reload them and lose your changes? If not,'
+                ' saving them will overwrite the other program\'s changes.'))
+            dialog.setDetailedText('\n'.join(unsaved))
+            dialog.setIcon(QtWidgets.QMessageBox.Warning)
+            dialog.setStandardButtons(
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+            dialog.setDefaultButton(QtWidgets.QMessageBox.No)
+            result = dialog.exec_()
+            self.change_detector.resume()
+            if result != QtWidgets.QMessageBox.Yes:
+                paths = [x for x in paths if x not in unsaved]
+            # files may have been closed while the dialog was open
+            paths = [x for x in paths if x in self.image]
+        if not paths:
+            return
+        with Busy():
+            for path in paths:
+                image = self.image[path]
+                image.reload()
+                self._index_image(image)
+            metadata_cache.flush()
+        self.apply_filter()
+        self.emit_selection()
+        self.image_list_changed.emit()
+        unsaved = False
+        for path in self.path_list:
+            unsaved = unsaved or self.image[path].metadata.changed()
+        self.new_metadata.emit(unsaved)
+
     @QtCore.pyqtSlot()
     def save_files(self):
         if_mode = eval(self.config_store.get('files', 'image', 'True'))
         sc_mode = self.config_store.get('files', 'sidecar', 'auto')
         force_iptc = eval(self.config_store.get('files', 'force_iptc', 'False'))
-        unsaved = False
-        for path in list(self.path_list):
+        safe_write = eval(self.config_store.get('files', 'safe_write', 'False'))
+        images = []
+        for path in self.path_list:
             image = self.image[path]
-            image.metadata.save(if_mode, sc_mode, force_iptc)
-            unsaved = unsaved or image.metadata.changed()
+            if image.metadata.changed():
+                images.append(image)
+        if images:
+            if safe_write:
+                batch = SafeSaveBatch()
+            else:
+                batch = None
+            self._save_images(images, if_mode, sc_mode, force_iptc, batch)
+        unsaved = False
+        for path in self.path_list:
+            unsaved = unsaved or self.image[path].metadata.changed()
         self.new_metadata.emit(unsaved)
+        return not unsaved
+
+    def _save_images(self, images, if_mode, sc_mode, force_iptc, batch):
+        thread_count = min(
+            max(QtCore.QThread.idealThreadCount(), 1), len(images))
+        engine = SaveEngine(thread_count)
+        self.save_progress = QtWidgets.QProgressDialog(
+            self.tr('Saving metadata...'), self.tr('Cancel'),
+            0, len(images), self)
+        self.save_progress.setWindowTitle(self.tr('Photini: saving'))
+        self.save_progress.setWindowModality(Qt.WindowModal)
+        self.save_progress.setMinimumDuration(1000)
+        self.save_progress.canceled.connect(engine.cancel)
+        self.save_done = 0
+        self.save_failed = []
+        engine.image_saved.connect(self.image_saved)
+        # don't report our own changes as changes by another program
+        self.change_detector.pause()
+        # run an event loop until all workers have finished
+        loop = QtCore.QEventLoop()
+        engine.finished.connect(loop.quit)
+        engine.save(images, if_mode, sc_mode, force_iptc, batch)
+        loop.exec_()
+        engine.shutdown()
+        self.save_progress.reset()
+        self.save_progress = None
+        if batch:
+            with Busy():
+                self.save_failed += batch.commit()
+        self.change_detector.refresh([x.path for x in images])
+        self.change_detector.resume()
+        if not self.save_failed:
+            return
+        dialog = QtWidgets.QMessageBox()
+        dialog.setWindowTitle(self.tr('Photini: save error'))
+        dialog.setText(self.tr('<h3>Some images could not be saved.</h3>'))
+        dialog.setInformativeText(
+            self.tr('%n file(s) still have unsaved metadata.', '',
+                    len(self.save_failed)))
+        dialog.setDetailedText('\n'.join(self.save_failed))
+        dialog.setIcon(QtWidgets.QMessageBox.Warning)
+        dialog.exec_()
+
+    @QtCore.pyqtSlot(object, bool)
+    def image_saved(self, image, OK):
+        if not OK:
+            self.save_failed.append(image.path)
+        self.save_done += 1
+        self.save_progress.setValue(self.save_done)
 
     def unsaved_files_dialog(
             self, all_files=False, with_cancel=True, with_discard=True):
@@ -509,8 +1129,7 @@ class ImageList(QtWidgets.QWidget):
         dialog.setDefaultButton(QtWidgets.QMessageBox.Save)
         result = dialog.exec_()
         if result == QtWidgets.QMessageBox.Save:
-            self.save_files()
-            return True
+            return self.save_files()
         return result == QtWidgets.QMessageBox.Discard
 
     def get_selected_images(self):
@@ -522,6 +1141,8 @@ class ImageList(QtWidgets.QWidget):
         return selection
 
     def emit_selection(self):
+        # show new selection
+        self.thumbnails.viewport().update()
         self.selection_changed.emit(self.get_selected_images())
 
     def thumb_mouse_press(self, path, event):
@@ -533,7 +1154,7 @@ class ImageList(QtWidgets.QWidget):
             self.select_image(path)
 
     def select_all(self):
-        for path in self.path_list:
+        for path in self._visible_paths():
             image = self.image[path]
             image.set_selected(True)
         self.selection_anchor = None
@@ -553,34 +1174,42 @@ class ImageList(QtWidgets.QWidget):
         self._inc_selection(1, extend_selection=True)
 
     def _inc_selection(self, inc, extend_selection=False):
-        if self.last_selected:
-            idx = self.path_list.index(self.last_selected)
-            idx = (idx + inc) % len(self.path_list)
+        path_list = self._visible_paths()
+        if not path_list:
+            return
+        if self.last_selected in path_list:
+            idx = path_list.index(self.last_selected)
+            idx = (idx + inc) % len(path_list)
         else:
             idx = 0
-        path = self.path_list[idx]
+        path = path_list[idx]
         self.select_image(path, extend_selection=extend_selection)
 
     @QtCore.pyqtSlot()
     def _new_thumb_size(self):
         self.thumb_size = self.size_slider.value() * 20
         self.config_store.set('controls', 'thumb_size', str(self.thumb_size))
-        for path in self.path_list:
-            self.image[path].set_thumb_size(self.thumb_size)
+        self.thumb_loader.clear()
+        self.thumb_cache.clear()
+        self.thumbnails.set_thumb_size(self.thumb_size)
         if self.last_selected:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(self.image[self.last_selected])
+            self._scroll_to(self.last_selected)
 
     def select_image(
             self, path, extend_selection=False, multiple_selection=False):
         image = self.image[path]
-        self.scroll_area.ensureWidgetVisible(image)
+        if path in self.hidden:
+            # e.g. clicked on the map, so stop filtering it out
+            self.filter_edit.clear()
+            self.apply_filter()
+        self._scroll_to(path)
         if extend_selection and self.selection_anchor:
             self._clear_selection()
-            idx1 = self.path_list.index(self.selection_anchor)
-            idx2 = self.path_list.index(path)
+            path_list = self._visible_paths()
+            idx1 = path_list.index(self.selection_anchor)
+            idx2 = path_list.index(path)
             for i in range(min(idx1, idx2), max(idx1, idx2) + 1):
-                self.image[self.path_list[i]].set_selected(True)
+                self.image[path_list[i]].set_selected(True)
         elif multiple_selection:
             image.set_selected(not image.get_selected())
             self.selection_anchor = path
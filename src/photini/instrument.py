@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+
+from .metadata import DateTime, Metadata, MetadataHandler, SidecarIndex
+
+# wall clock timer with the best available resolution
+_timer = getattr(time, 'perf_counter', time.time)
+
+class Instrument(object):
+    """Optional counting and timing of metadata operations.
+
+    When enabled, the main GExiv2 calls and some of Photini's own
+    metadata methods are wrapped so that the number of calls and total
+    time taken are recorded, per operation and per tag family (Exif,
+    Iptc or Xmp). Times include any instrumented calls made within an
+    operation, e.g. Metadata.__getattr__ includes the GExiv2 calls it
+    makes.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._originals = []
+
+    def _targets(self):
+        # (class, method name, first argument is a tag name)
+        result = []
+        for name in sorted(dir(MetadataHandler)):
+            if name.startswith('set_tag_') or name in (
+                    'clear_tag', 'get_tag_multiple', 'get_tag_string'):
+                result.append((MetadataHandler, name, True))
+        result += [
+            (MetadataHandler, 'save_file',       False),
+            (MetadataHandler, 'copy',            False),
+            (Metadata,        '__getattr__',     False),
+            (Metadata,        'save',            False),
+            (SidecarIndex,    'find',            False),
+            (DateTime,        '_parse_ISO_8601', False),
+            ]
+        return result
+
+    def enabled(self):
+        return bool(self._originals)
+
+    def enable(self):
+        if self._originals:
+            return
+        for cls, name, tag_arg in self._targets():
+            original = cls.__dict__.get(name)
+            if isinstance(original, classmethod):
+                func = original.__func__
+            else:
+                func = getattr(cls, name)
+            wrapper = self._wrap(
+                '{}.{}'.format(cls.__name__, name), func, tag_arg)
+            if isinstance(original, classmethod):
+                wrapper = classmethod(wrapper)
+            setattr(cls, name, wrapper)
+            self._originals.append((cls, name, original))
+
+    def disable(self):
+        while self._originals:
+            cls, name, original = self._originals.pop()
+            if original is None:
+                # method was inherited
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+
+    def _wrap(self, operation, func, tag_arg):
+        def wrapper(*args, **kw):
+            start = _timer()
+            try:
+                return func(*args, **kw)
+            finally:
+                elapsed = _timer() - start
+                family = ''
+                if tag_arg and len(args) > 1:
+                    family = args[1].partition('.')[0]
+                self._record(operation, family, elapsed)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def _record(self, operation, family, elapsed):
+        with self._lock:
+            stats = self._stats.setdefault((operation, family), [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def results(self):
+        """Get a list of (operation, family, count, seconds) tuples,
+        slowest first."""
+        with self._lock:
+            result = [(operation, family, count, seconds) for
+                      ((operation, family), (count, seconds))
+                      in self._stats.items()]
+        result.sort(key=lambda x: (-x[3], x[0], x[1]))
+        return result
+
+    def as_dict(self):
+        result = {}
+        for operation, family, count, seconds in self.results():
+            result.setdefault(operation, {})[family] = {
+                'count': count, 'seconds': seconds}
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+
+# one Instrument object for the entire application
+instrument = Instrument()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from bisect import bisect_left, insort
+import codecs
+import json
+import logging
+import os
+import time
+
+import appdirs
+
+class KeywordVocabulary(object):
+    """Store of known keywords, for auto completion.
+
+    Keywords are held in a list sorted by lower case, so all keywords
+    starting with a prefix can be found with a binary search. Each
+    keyword also has a count of how often it's been seen or used and
+    the time it was last seen or used. Completions are ranked by count,
+    with the count halving every HALF_LIFE seconds since last use, so
+    recent and frequent keywords come first.
+
+    The vocabulary is loaded when first needed and saved by save().
+
+    """
+    # ranking half life, in seconds
+    HALF_LIFE = 30 * 24 * 3600
+
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not path:
+            path = os.path.join(
+                appdirs.user_data_dir('photini'), 'keywords.json')
+        self._path = path
+        # sorted list of (lower case keyword, keyword)
+        self._keys = None
+        # keyword: [count, last used time]
+        self._stats = None
+        self._modified = False
+
+    def _load(self):
+        if self._keys is not None:
+            return
+        self._keys = []
+        self._stats = {}
+        if not os.path.exists(self._path):
+            return
+        try:
+            with codecs.open(self._path, 'r', encoding='utf_8') as f:
+                stats = json.load(f)
+        except (IOError, ValueError) as ex:
+            self.logger.error('Cannot read %s: %s', self._path, str(ex))
+            return
+        self._stats = stats
+        self._keys = sorted((x.lower(), x) for x in stats)
+
+    def save(self):
+        if not self._modified:
+            return
+        directory = os.path.dirname(self._path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with codecs.open(self._path, 'w', encoding='utf_8') as f:
+                json.dump(self._stats, f, ensure_ascii=False)
+        except (IOError, OSError) as ex:
+            self.logger.error('Cannot write %s: %s', self._path, str(ex))
+            return
+        self._modified = False
+
+    def __len__(self):
+        self._load()
+        return len(self._keys)
+
+    def __contains__(self, keyword):
+        self._load()
+        return keyword in self._stats
+
+    def add(self, keyword, count=1):
+        """Add a keyword, or increase its count if already known.
+
+        Use count=0 to add a keyword without making it rank higher,
+        e.g. when importing a controlled vocabulary.
+
+        """
+        keyword = keyword.strip()
+        if not keyword:
+            return
+        self._load()
+        self._modified = True
+        if keyword not in self._stats:
+            insort(self._keys, (keyword.lower(), keyword))
+            self._stats[keyword] = [0, 0.0]
+        if count:
+            stats = self._stats[keyword]
+            stats[0] += count
+            stats[1] = time.time()
+
+    def update(self, keywords, count=1):
+        for keyword in keywords:
+            self.add(keyword, count)
+
+    def import_file(self, path):
+        """Add keywords from a text file, one per line.
+
+        Indentation and lines starting with '#' are ignored. Returns the
+        number of keywords that were new.
+
+        """
+        self._load()
+        before = len(self._keys)
+        with codecs.open(path, 'r', encoding='utf_8_sig') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    self.add(line, count=0)
+        return len(self._keys) - before
+
+    def complete(self, prefix, limit=50):
+        """Return up to limit keywords starting with prefix, best first.
+
+        The match is not case sensitive.
+
+        """
+        self._load()
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        now = time.time()
+        matches = []
+        idx = bisect_left(self._keys, (prefix,))
+        while idx < len(self._keys) and self._keys[idx][0].startswith(prefix):
+            keyword = self._keys[idx][1]
+            count, last_used = self._stats[keyword]
+            if count:
+                score = count * 0.5 ** ((now - last_used) / self.HALF_LIFE)
+            else:
+                score = 0.0
+            # negate score so sort puts best first, then alphabetical
+            matches.append((-score, idx, keyword))
+            idx += 1
+        matches.sort()
+        return [x[2] for x in matches[:limit]]
+
+
+# one KeywordVocabulary object for the entire application
+keyword_vocabulary = KeywordVocabulary()
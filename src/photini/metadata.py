@@ -19,26 +19,94 @@
 
 from __future__ import unicode_literals
 
+from collections import namedtuple, OrderedDict
+import copy
 from datetime import datetime
 from fractions import Fraction
 import locale
 import logging
 import math
 import os
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
 
 from gi.repository import GObject, GExiv2
 import six
 
-from .pyqt import QtCore
+from .metadatacache import metadata_cache
 from . import __version__
 
 # pydoc gi.repository.GExiv2.Metadata is useful to see methods available
 
 GExiv2.log_set_level(GExiv2.LogLevel.MUTE)
+# exiv2 must be initialised before handlers are used in several threads
+if hasattr(GExiv2, 'initialize'):
+    GExiv2.initialize()
+
+class ValueRecord(object):
+    # compact replacement for a dict with a fixed set of keys, used to
+    # store multi-part values such as latitude & longitude
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for key, value in zip(self.__slots__, args):
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return dict(zip(self.__slots__, self.__getstate__())) == other
+        return (isinstance(other, self.__class__) and
+                self.__getstate__() == other.__getstate__())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(zip(self.__slots__, self.__getstate__())))
+
+
+class _LatLonValue(ValueRecord):
+    __slots__ = ('lat', 'lon')
+
+
+class _LensSpecValue(ValueRecord):
+    __slots__ = ('min_fl', 'max_fl', 'min_fl_fn', 'max_fl_fn')
+
+
+class _DateTimeValue(ValueRecord):
+    __slots__ = ('datetime', 'precision', 'tz_offset')
+
 
 class MetadataValue(object):
     # base for classes that store a metadata value, e.g. a string, int
     # or latitude & longitude pair
+    __slots__ = ('value',)
+
     def __init__(self, value):
         assert(value is not None)
         self.value = value
@@ -55,6 +123,14 @@ class MetadataValue(object):
     def from_xmp(cls, value):
         return cls(value)
 
+    # conversion to and from types that can be stored as JSON
+    @classmethod
+    def from_json(cls, value):
+        return cls(value)
+
+    def to_json(self):
+        return self.value
+
     def __nonzero__(self):
         return bool(self.value)
 
@@ -75,19 +151,22 @@ class MetadataValue(object):
 
 
 class Ignore(MetadataValue):
-    pass
+    __slots__ = ()
 
 
 class LatLon(MetadataValue):
     # simple class to store latitude and longitude
+    __slots__ = ()
+
     def __init__(self, value):
         if isinstance(value, six.string_types):
             value = value.split(',')
         lat, lon = value
-        super(LatLon, self).__init__({
-            'lat' : round(float(lat), 6),
-            'lon' : round(float(lon), 6),
-            })
+        super(LatLon, self).__init__(_LatLonValue(
+            round(float(lat), 6), round(float(lon), 6)))
+
+    def to_json(self):
+        return [self.value['lat'], self.value['lon']]
 
     @staticmethod
     def from_exif_part(value, ref):
@@ -152,6 +231,8 @@ class LatLon(MetadataValue):
 
 class LensSpec(MetadataValue):
     # simple class to store lens "specificaton"
+    __slots__ = ()
+
     def __init__(self, value):
         if isinstance(value, six.string_types):
             sep = None
@@ -159,12 +240,13 @@ class LensSpec(MetadataValue):
                 sep = ','
             value = value.split(sep)
         min_fl, max_fl, min_fl_fn, max_fl_fn = value
-        super(LensSpec, self).__init__({
-            'min_fl'    : Fraction(min_fl).limit_denominator(1000000),
-            'max_fl'    : Fraction(max_fl).limit_denominator(1000000),
-            'min_fl_fn' : Fraction(min_fl_fn).limit_denominator(1000000),
-            'max_fl_fn' : Fraction(max_fl_fn).limit_denominator(1000000),
-            })
+        super(LensSpec, self).__init__(_LensSpecValue(
+            *[Fraction(x).limit_denominator(1000000)
+              for x in (min_fl, max_fl, min_fl_fn, max_fl_fn)]))
+
+    def to_json(self):
+        return [six.text_type(self.value[x]) for x in (
+            'min_fl', 'max_fl', 'min_fl_fn', 'max_fl_fn')]
 
     def __str__(self):
         return '{:g} {:g} {:g} {:g}'.format(
@@ -181,12 +263,11 @@ class LensSpec(MetadataValue):
 class DateTime(MetadataValue):
     # store date and time with "precision" to store how much is valid
     # tz_offset is stored in minutes
+    __slots__ = ()
+
     def __init__(self, datetime, precision, tz_offset=None):
-        super(DateTime, self).__init__({
-            'datetime'  : datetime,
-            'precision' : precision,
-            'tz_offset' : tz_offset,
-            })
+        super(DateTime, self).__init__(
+            _DateTimeValue(datetime, precision, tz_offset))
 
     @classmethod
     def from_ISO_8601(cls, date_string, time_string):
@@ -196,6 +277,32 @@ class DateTime(MetadataValue):
         See https://en.wikipedia.org/wiki/ISO_8601
 
         """
+        # the same few strings are parsed over and over again, e.g.
+        # when sorting by date, so remember recent results
+        key = date_string, time_string
+        memo = cls._ISO_8601_memo
+        with cls._ISO_8601_lock:
+            result = memo.pop(key, None)
+            if result is not None:
+                # move to most recently used end
+                memo[key] = result
+        if result is None:
+            result = cls._parse_ISO_8601(date_string, time_string)
+            with cls._ISO_8601_lock:
+                memo[key] = result
+                while len(memo) > 2000:
+                    memo.popitem(last=False)
+        if not result:
+            return None
+        # return a new object, as callers may modify its value
+        return cls(*result)
+
+    # key: parsed result, least recently used first
+    _ISO_8601_memo = OrderedDict()
+    _ISO_8601_lock = threading.Lock()
+
+    @classmethod
+    def _parse_ISO_8601(cls, date_string, time_string):
         # separate time and timezone
         tz_offset = None
         if time_string:
@@ -217,11 +324,57 @@ class DateTime(MetadataValue):
         datetime_string = date_string + time_string
         precision = min((len(datetime_string) - 2) // 2, 6)
         if precision <= 0:
-            return None
+            return ()
         if precision == 6 and datetime_string.count('.') > 0:
             precision = 7
-        fmt = ''.join(cls.basic_fmt[:precision])
-        return cls(datetime.strptime(datetime_string, fmt), precision, tz_offset)
+        date_time = cls._parse_basic(datetime_string)
+        if date_time is None:
+            # not a simple case, so let strptime parse it or raise an
+            # exception
+            fmt = ''.join(cls.basic_fmt[:precision])
+            date_time = datetime.strptime(datetime_string, fmt)
+        return date_time, precision, tz_offset
+
+    @staticmethod
+    def _parse_basic(datetime_string):
+        # Parse YYYY[mm[dd[HH[MM[SS[.ffffff]]]]]] much faster than
+        # strptime. Returns None for anything else, including invalid
+        # dates.
+        length = len(datetime_string)
+        fraction = None
+        if length > 14:
+            if length > 21 or datetime_string[14] != '.':
+                return None
+            fraction = datetime_string[15:]
+            datetime_string = datetime_string[:14]
+            if not (fraction.isdigit() and max(fraction) <= '9'):
+                return None
+        elif length < 4 or length % 2:
+            return None
+        if not (datetime_string.isdigit() and max(datetime_string) <= '9'):
+            return None
+        fields = [int(datetime_string[0:4]), 1, 1]
+        for i in range(4, len(datetime_string), 2):
+            if i < 8:
+                fields[i // 2 - 1] = int(datetime_string[i:i+2])
+            else:
+                fields.append(int(datetime_string[i:i+2]))
+        if fraction:
+            fields.append(int(fraction + '000000'[len(fraction):]))
+        try:
+            return datetime(*fields)
+        except ValueError:
+            return None
+
+    @classmethod
+    def from_json(cls, value):
+        # ISO 8601 "extended" format, e.g. 2015-06-30T12:00:00+01:00
+        date_string, sep, time_string = value.partition('T')
+        return cls.from_ISO_8601(
+            date_string.replace('-', ''), time_string.replace(':', ''))
+
+    def to_json(self):
+        return self.to_ISO_8601()
 
     basic_fmt    = ('%Y',  '%m',  '%d',  '%H',  '%M',  '%S', '.%f')
     extended_fmt = ('%Y', '-%m', '-%d', 'T%H', ':%M', ':%S', '.%f')
@@ -368,6 +521,8 @@ class DateTime(MetadataValue):
 
 @six.python_2_unicode_compatible
 class MultiString(MetadataValue):
+    __slots__ = ()
+
     def __init__(self, value):
         if isinstance(value, six.string_types):
             value = value.split(';')
@@ -408,6 +563,8 @@ class MultiString(MetadataValue):
 
 @six.python_2_unicode_compatible
 class String(MetadataValue):
+    __slots__ = ()
+
     def __init__(self, value):
         if isinstance(value, list):
             value = value[0]
@@ -441,6 +598,8 @@ class String(MetadataValue):
 
 
 class Software(String):
+    __slots__ = ()
+
     @classmethod
     def from_iptc(cls, value_list):
         program, version = value_list
@@ -458,18 +617,24 @@ class Software(String):
 
 
 class Int(MetadataValue):
+    __slots__ = ()
+
     def __init__(self, value):
         super(Int, self).__init__(int(value))
-        self.to_exif = self.__str__
 
     def __nonzero__(self):
         return self.value is not None
 
+    def to_exif(self):
+        return self.__str__()
+
     def __str__(self):
         return '{:d}'.format(self.value)
 
 
 class Rational(MetadataValue):
+    __slots__ = ()
+
     def __init__(self, value):
         super(Rational, self).__init__(Fraction(value))
 
@@ -479,14 +644,24 @@ class Rational(MetadataValue):
     def to_exif(self):
         return '{:d}/{:d}'.format(self.value.numerator, self.value.denominator)
 
+    def to_json(self):
+        return six.text_type(self.value)
+
     def __str__(self):
         return '{:g}'.format(float(self.value))
 
 
 class APEXAperture(Rational):
+    __slots__ = ()
+
     def __init__(self, value):
         super(APEXAperture, self).__init__(math.sqrt(2.0 ** Fraction(value)))
 
+    @classmethod
+    def from_json(cls, value):
+        # stored value is an f number, not an APEX value
+        return Rational(value)
+
 
 # type of each tag's data
 _data_type = {
@@ -585,7 +760,7 @@ _sub_tags = {
                                             'Exif.GPSInfo.GPSLongitude',
                                             'Exif.GPSInfo.GPSLongitudeRef', ),
     'Exif.Image.DateTime'                : ('Exif.Photo.SubSecTime', ),
-    'Exif.Image.DateTimeOriginal'        : ('None', ),
+    'Exif.Image.DateTimeOriginal'        : (None, ),
     'Exif.Photo.DateTimeDigitized'       : ('Exif.Photo.SubSecTimeDigitized', ),
     'Exif.Photo.DateTimeOriginal'        : ('Exif.Photo.SubSecTimeOriginal', ),
     'Iptc.Application2.DateCreated'      : ('Iptc.Application2.TimeCreated', ),
@@ -594,13 +769,214 @@ _sub_tags = {
     'Xmp.exif.GPSLatitude'               : ('Xmp.exif.GPSLongitude', ),
     }
 
+# tags that are read as strings, whatever their type
+# (None is a place holder for a sub tag that doesn't exist)
+_string_tags = set(_sub_tags)
+for _tags in _sub_tags.values():
+    _string_tags.update(x for x in _tags if x)
+# all tags that are used to get Photini data fields
+_known_tags = set([x for x in _data_type if '.' in x]) | _string_tags
+# exiv2 type of each tag, as returned by get_tag_type
+_tag_types = {}
+
 _encodings = None
 
+def replace_file(temp_path, path):
+    """Rename temp_path to path, atomically if possible."""
+    if hasattr(os, 'replace'):
+        os.replace(temp_path, path)
+    else:
+        if sys.platform == 'win32' and os.path.exists(path):
+            # Python 2 can't replace a file atomically on Windows
+            os.unlink(path)
+        os.rename(temp_path, path)
+
+
+class SafeSaveBatch(object):
+    """Write files via temporary copies, then move them into place.
+
+    Each file in the batch is saved to a temporary file in the same
+    directory. When the batch is committed all the temporary files are
+    flushed to disk, renamed over the originals and each directory is
+    flushed once. A crash during a save therefore leaves either the old
+    or the new file, never a truncated one, without the cost of
+    flushing every file separately.
+
+    The new file replaces the original, so it has a new inode. Its
+    permissions, timestamps, extended attributes and (where allowed)
+    owner are copied from the original when it's saved, but any hard
+    links to the original still point to the old data.
+
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._deletions = []
+
+    def add(self, temp_path, path, on_failure=None):
+        with self._lock:
+            self._pending.append((temp_path, path, on_failure))
+
+    def unlink(self, path, after):
+        # delete path, but only if the file 'after' is committed
+        with self._lock:
+            self._deletions.append((path, after))
+
+    def _flush(self, path):
+        fd = os.open(path, os.O_RDWR)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def commit(self):
+        """Move temporary files into place. Returns failed paths."""
+        with self._lock:
+            pending = self._pending
+            deletions = self._deletions
+            self._pending = []
+            self._deletions = []
+        # make sure all file contents are on disk before renaming
+        for temp_path, path, on_failure in pending:
+            try:
+                self._flush(temp_path)
+            except OSError as ex:
+                self.logger.exception(ex)
+        failed = []
+        directories = set()
+        for temp_path, path, on_failure in pending:
+            try:
+                replace_file(temp_path, path)
+            except OSError as ex:
+                self.logger.exception(ex)
+                failed.append(path)
+                if on_failure:
+                    on_failure()
+                try:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+                except OSError as ex:
+                    self.logger.exception(ex)
+                continue
+            directories.add(os.path.dirname(os.path.abspath(path)))
+        for path, after in deletions:
+            if after in failed:
+                continue
+            try:
+                os.unlink(path)
+            except OSError as ex:
+                self.logger.exception(ex)
+                failed.append(path)
+                continue
+            directories.add(os.path.dirname(os.path.abspath(path)))
+        # make renames and deletions permanent
+        if sys.platform != 'win32':
+            for directory in directories:
+                try:
+                    fd = os.open(directory, os.O_RDONLY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                except OSError as ex:
+                    self.logger.exception(ex)
+        return failed
+
+
+class SidecarIndex(object):
+    """Find image files' XMP sidecars without probing for each one.
+
+    Each directory is listed once, the first time a sidecar is looked
+    up in it, and its sidecar files are stored by base name. On file
+    systems that usually ignore case the base names and extensions
+    are matched without regard to case.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = {}
+        self._fold_case = sys.platform in ('win32', 'darwin')
+
+    def _key(self, name):
+        base, ext = os.path.splitext(name)
+        if self._fold_case:
+            return base.lower(), ext.lower()
+        return base, ext
+
+    def _add(self, sidecars, name):
+        base, ext = self._key(name)
+        if ext not in ('.xmp', '.XMP'):
+            return
+        names = sidecars.setdefault(base, [])
+        if name in names:
+            return
+        # prefer '.xmp' to '.XMP', as the old file probing did
+        if os.path.splitext(name)[1] == '.xmp':
+            names.insert(0, name)
+        else:
+            names.append(name)
+
+    def _scan(self, directory):
+        sidecars = {}
+        if hasattr(os, 'scandir'):
+            names = [x.name for x in os.scandir(directory or '.')]
+        else:
+            names = os.listdir(directory or '.')
+        for name in names:
+            self._add(sidecars, name)
+        return sidecars
+
+    def find(self, path):
+        directory, name = os.path.split(path)
+        with self._lock:
+            if directory not in self._dirs:
+                try:
+                    self._dirs[directory] = self._scan(directory)
+                except OSError:
+                    return None
+            sidecars = self._dirs[directory]
+            for base in (os.path.splitext(name)[0], name):
+                if self._fold_case:
+                    base = base.lower()
+                if sidecars.get(base):
+                    return os.path.join(directory, sidecars[base][0])
+        return None
+
+    def add(self, path):
+        directory, name = os.path.split(path)
+        with self._lock:
+            if directory in self._dirs:
+                self._add(self._dirs[directory], name)
+
+    def remove(self, path):
+        directory, name = os.path.split(path)
+        with self._lock:
+            names = self._dirs.get(directory, {}).get(self._key(name)[0])
+            if names and name in names:
+                names.remove(name)
+
+    def forget(self, directory):
+        # discard a directory's listing, e.g. if it may be out of date
+        with self._lock:
+            self._dirs.pop(directory, None)
+
+
+# one SidecarIndex object for the entire application
+sidecar_index = SidecarIndex()
+
+
 class MetadataHandler(GExiv2.Metadata):
-    def __init__(self, path, image_data=None):
+    def __init__(self, path, image_data=None, snapshot=False):
         super(MetadataHandler, self).__init__()
         self._logger = logging.getLogger(self.__class__.__name__)
         self._path = path
+        # in snapshot mode every known tag present in the file is read
+        # the first time any tag is wanted, then served from memory.
+        # GExiv2 has no call that reads many tags at once, so each tag
+        # is still read separately, but only once
+        self._use_snapshot = snapshot
+        self._snapshot = None
         if image_data:
             self.open_buf(image_data)
         else:
@@ -622,6 +998,48 @@ class MetadataHandler(GExiv2.Metadata):
                 continue
         return value.decode('utf_8')
 
+    def _read_tag(self, tag):
+        # get tag value from file, as string or list of strings
+        if tag in _string_tags:
+            return self.get_tag_string(tag)
+        if tag not in _tag_types:
+            _tag_types[tag] = MetadataHandler.get_tag_type(tag)
+        exiv_type = _tag_types[tag]
+        if exiv_type in ('Ascii', 'XmpText'):
+            return self.get_tag_string_unicode(tag)
+        if exiv_type in ('Rational', 'Short'):
+            return self.get_tag_string(tag)
+        if exiv_type in ('LangAlt', 'String', 'XmpBag', 'XmpSeq'):
+            return self.get_tag_multiple_unicode(tag)
+        raise RuntimeError('Unknown tag type ' + exiv_type)
+
+    def _take_snapshot(self):
+        # read every known tag present in the file
+        self._snapshot = {}
+        for tag in (self.get_exif_tags() + self.get_iptc_tags() +
+                    self.get_xmp_tags()):
+            if tag not in _known_tags or tag in self._snapshot:
+                continue
+            try:
+                self._snapshot[tag] = self._read_tag(tag)
+            except Exception as ex:
+                self._logger.exception(ex)
+
+    def _update_snapshot(self, tags):
+        # re-read tags that have been written
+        if self._snapshot is None:
+            return
+        for tag in tags:
+            if tag:
+                self._snapshot[tag] = self._read_tag(tag)
+
+    def _get_tag(self, tag):
+        if not self._use_snapshot:
+            return self._read_tag(tag)
+        if self._snapshot is None:
+            self._take_snapshot()
+        return self._snapshot.get(tag)
+
     def get_value(self, tag):
         # get value as our preferred data type
         if tag in _sub_tags:
@@ -629,20 +1047,12 @@ class MetadataHandler(GExiv2.Metadata):
             file_value = []
             for sub_tag in [tag] + list(_sub_tags[tag]):
                 if sub_tag:
-                    file_value.append(self.get_tag_string(sub_tag))
+                    file_value.append(self._get_tag(sub_tag))
                 else:
                     file_value.append(None)
         else:
             # single tag value
-            exiv_type = MetadataHandler.get_tag_type(tag)
-            if exiv_type in ('Ascii', 'XmpText'):
-                file_value = self.get_tag_string_unicode(tag)
-            elif exiv_type in ('Rational', 'Short'):
-                file_value = self.get_tag_string(tag)
-            elif exiv_type in ('LangAlt', 'String', 'XmpBag', 'XmpSeq'):
-                file_value = self.get_tag_multiple_unicode(tag)
-            else:
-                raise RuntimeError('Unknown tag type ' + exiv_type)
+            file_value = self._get_tag(tag)
         if not file_value:
             return None
         if MetadataHandler.is_exif_tag(tag):
@@ -652,14 +1062,19 @@ class MetadataHandler(GExiv2.Metadata):
         return _data_type[tag].from_xmp(file_value)
 
     def set_value(self, tag, value):
+        if tag in _sub_tags:
+            tag_list = [tag] + list(_sub_tags[tag])
+        else:
+            tag_list = [tag]
+        self._set_value(tag, tag_list, value)
+        self._update_snapshot(tag_list)
+
+    def _set_value(self, tag, tag_list, value):
         # clear tag(s) if no value
         if not value:
-            if tag in _sub_tags:
-                for sub_tag in [tag] + list(_sub_tags[tag]):
-                    if sub_tag:
-                        self.clear_tag(sub_tag)
-            else:
-                self.clear_tag(tag)
+            for sub_tag in tag_list:
+                if sub_tag:
+                    self.clear_tag(sub_tag)
             return
         # get output formatted value(s)
         if MetadataHandler.is_exif_tag(tag):
@@ -670,7 +1085,6 @@ class MetadataHandler(GExiv2.Metadata):
             file_value = value.to_xmp()
         # do multi-tag items
         if tag in _sub_tags:
-            tag_list = [tag] + list(_sub_tags[tag])
             for sub_tag, value_string in zip(tag_list, file_value):
                 if sub_tag:
                     if value_string:
@@ -704,22 +1118,93 @@ class MetadataHandler(GExiv2.Metadata):
             return []
         return result
 
-    def save(self):
+    def get_preview(self, min_size):
+        """Get data of an embedded preview image, e.g. from a raw file.
+
+        Chooses the smallest preview whose width or height is at least
+        min_size, or the largest if none is that big. Returns None if
+        there are no previews.
+
+        """
+        best = None
+        best_size = 0
+        for props in self.get_preview_properties():
+            size = max(props.get_width(), props.get_height())
+            if best is None:
+                better = True
+            elif best_size < min_size:
+                # anything bigger is better
+                better = size > best_size
+            else:
+                better = min_size <= size < best_size
+            if better:
+                best = props
+                best_size = size
+        if best is None:
+            return None
+        return self.get_preview_image(best).get_data()
+
+    def save(self, batch=None, on_failure=None):
+        if not batch:
+            try:
+                self.save_file(self._path)
+            except GObject.GError as ex:
+                self._logger.exception(ex)
+                return False
+            return True
+        # save to a copy of the file, which batch will move into place
+        directory, name = os.path.split(os.path.abspath(self._path))
+        base, ext = os.path.splitext(name)
         try:
-            self.save_file(self._path)
-        except GObject.GError as ex:
+            fd, temp_path = tempfile.mkstemp(
+                suffix=ext, prefix='.' + base + '.', dir=directory)
+            os.close(fd)
+        except OSError as ex:
+            self._logger.exception(ex)
+            return False
+        try:
+            shutil.copyfile(self._path, temp_path)
+            # copies permissions and extended attributes, the
+            # timestamps are updated by save_file
+            shutil.copystat(self._path, temp_path)
+            self._copy_owner(temp_path)
+            self.save_file(temp_path)
+        except (GObject.GError, IOError, OSError) as ex:
             self._logger.exception(ex)
+            os.unlink(temp_path)
             return False
+        batch.add(temp_path, self._path, on_failure)
         return True
 
+    def _copy_owner(self, temp_path):
+        if not hasattr(os, 'chown'):
+            return
+        stat = os.stat(self._path)
+        try:
+            os.chown(temp_path, stat.st_uid, stat.st_gid)
+        except OSError:
+            # only allowed to give a file to another user if root
+            try:
+                os.chown(temp_path, -1, stat.st_gid)
+            except OSError:
+                pass
+
     def copy(self, other, exif=True, iptc=True, xmp=True, comment=True):
         # copy from other to self
+        if (exif and iptc and xmp and (comment or not other.get_comment())
+                and self._bulk_copy(other)):
+            return
         if exif:
             for tag in other.get_exif_tags():
                 self.set_tag_string(
                     tag, other.get_tag_string(tag))
         if iptc:
+            # repeatable datasets are listed once per value
+            done = set()
             for tag in other.get_iptc_tags():
+                if tag in done:
+                    continue
+                done.add(tag)
                 self.set_tag_multiple(
                     tag, other.get_tag_multiple(tag))
         if xmp:
@@ -730,9 +1215,112 @@ class MetadataHandler(GExiv2.Metadata):
             value = other.get_comment()
             if value:
                 self.set_comment(value)
+        self._snapshot = None
+
+    def _bulk_copy(self, other):
+        # If our file has no metadata of its own (e.g. a new sidecar)
+        # then let exiv2 write all of other's metadata to it in one
+        # go, instead of transferring thousands of tags one at a time,
+        # then re-read it. Returns False if the file must be copied to
+        # tag by tag instead.
+        if (self.get_exif_tags() or self.get_iptc_tags() or
+                self.get_xmp_tags() or self.get_comment()):
+            return False
+        try:
+            other.save_file(self._path)
+        except GObject.GError as ex:
+            self._logger.warning(
+                'bulk copy to %s failed: %s', self._path, str(ex))
+            return False
+        self.open_path(self._path)
+        self._snapshot = None
+        return True
+
+
+class Conflict(namedtuple('Conflict', ('field', 'used_tag', 'used_value',
+                                        'other_tag', 'other_value', 'merged'))):
+    # record of disagreeing tags found when reading a data field,
+    # formatted only when someone wants to see it
+    __slots__ = ()
+
+    def message(self):
+        if self.merged:
+            return 'merged {} into {}'.format(self.other_tag, self.used_tag)
+        return 'using {} value "{}", ignoring {} value "{}"'.format(
+            self.used_tag, six.text_type(self.used_value),
+            self.other_tag, six.text_type(self.other_value))
+
+
+class HandlerPool(object):
+    """Limit the number of Metadata objects with open file handlers.
+
+    Each MetadataHandler holds all of a file's parsed metadata, which
+    can be large, but Metadata objects only need their handlers while
+    reading a file or saving it. Metadata objects register here each
+    time they use their handlers, and the least recently used are told
+    to close theirs when there are more than size. Handlers are
+    reopened when next needed.
+
+    Use pin() and unpin() around operations that must not have their
+    handlers closed part way through, such as saving.
+
+    """
+    def __init__(self, size=64):
+        self.size = size
+        self._lock = threading.RLock()
+        # id(metadata): weak reference, least recently used first
+        self._open = OrderedDict()
+        self._pinned = {}
+
+    def __len__(self):
+        return len(self._open)
+
+    def _forget(self, key, ref):
+        # called when a Metadata object is deleted
+        with self._lock:
+            if self._open.get(key) is ref:
+                del self._open[key]
+
+    def use(self, metadata):
+        key = id(metadata)
+        with self._lock:
+            ref = self._open.pop(key, None)
+            if ref is None or ref() is not metadata:
+                ref = weakref.ref(
+                    metadata, lambda x, key=key: self._forget(key, x))
+            self._open[key] = ref
+            excess = len(self._open) - self.size
+            if excess <= 0:
+                return
+            for old_key, old_ref in list(self._open.items()):
+                if excess <= 0:
+                    break
+                if old_key in self._pinned:
+                    continue
+                del self._open[old_key]
+                excess -= 1
+                other = old_ref()
+                if other is not None:
+                    other._close_handlers()
 
+    def pin(self, metadata):
+        key = id(metadata)
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
 
-class Metadata(QtCore.QObject):
+    def unpin(self, metadata):
+        key = id(metadata)
+        with self._lock:
+            self._pinned[key] -= 1
+            if not self._pinned[key]:
+                del self._pinned[key]
+
+
+# one HandlerPool object for the entire application
+handler_pool = HandlerPool()
+
+
+class Metadata(object):
     # mapping of preferred tags to Photini data fields
     _primary_tags = {
         'aperture'       : {'Exif' : 'Exif.Photo.FNumber'},
@@ -803,31 +1391,111 @@ class Metadata(QtCore.QObject):
         'software'       : {},
         'title'          : {'Iptc' : ('Iptc.Application2.Headline',)},
         }
-    def __init__(self, path, image_data, parent=None):
-        super(Metadata, self).__init__(parent)
+    def __init__(self, path, image_data=None, cache=metadata_cache):
         self.logger = logging.getLogger(self.__class__.__name__)
-        # create metadata handlers for image file and/or sidecar
+        # functions to call with the new status when it changes
+        self.status_callbacks = []
+        # functions to call with name and value when a field is set
+        self.field_callbacks = []
         self._path = path
         self._sc_path = self._find_side_car(path)
-        if self._sc_path:
-            self._sc = MetadataHandler(self._sc_path)
+        self._sc = None
+        self._if = None
+        self._handlers_open = False
+        # True if handler_pool may close the handlers
+        self._pooled = False
+        self._cache = cache
+        self._unsaved = False
+        # names of fields that have been set since the last save
+        self._dirty = set()
+        # disagreements between tags found while reading fields
+        self._conflicts = []
+        # use cached values if the file hasn't changed
+        cache_key = None
+        if self._cache:
+            try:
+                cache_key = self._cache.file_key(self._path, self._sc_path)
+            except OSError:
+                pass
+        if cache_key:
+            cached = self._cache.get(self._path, cache_key)
+            if cached is not None:
+                values, self._conflicts = cached
+                for name in values:
+                    super(Metadata, self).__setattr__(name, values[name])
+                return
+        # create metadata handlers for image file and/or sidecar
+        sc_path = self._sc_path
+        # read every field now, so handlers can be closed at any time
+        # afterwards, but not while reading
+        handler_pool.pin(self)
+        try:
+            self._open_handlers(image_data)
+            values = {}
+            for name in self._primary_tags:
+                values[name] = getattr(self, name)
+        finally:
+            handler_pool.unpin(self)
+        if cache_key and self._sc_path == sc_path:
+            self._cache.put(self._path, cache_key, (values, self._conflicts))
+
+    def __getstate__(self):
+        # file handlers, logger and callbacks can't be pickled, so
+        # handlers are reopened when needed after unpickling
+        state = dict(self.__dict__)
+        for name in ('logger', 'status_callbacks', 'field_callbacks',
+                     '_sc', '_if'):
+            del state[name]
+        state['_handlers_open'] = False
+        state['_pooled'] = False
+        state['_cache'] = self._cache is metadata_cache
+        return state
+
+    def __setstate__(self, state):
+        if state['_cache']:
+            state['_cache'] = metadata_cache
         else:
-            self._sc = None
+            state['_cache'] = None
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.status_callbacks = []
+        self.field_callbacks = []
+        self._sc = None
+        self._if = None
+
+    def _open_handlers(self, image_data=None):
+        # handlers are not needed if values were read from cache
+        if self._handlers_open:
+            if self._pooled:
+                handler_pool.use(self)
+            return
+        self._handlers_open = True
+        if self._sc_path:
+            try:
+                self._sc = MetadataHandler(self._sc_path, snapshot=True)
+            except Exception as ex:
+                # sidecar may have been deleted since it was found
+                self.logger.error(str(ex))
+                self._sc_path = None
         try:
-            self._if = MetadataHandler(path, image_data)
+            self._if = MetadataHandler(
+                self._path, image_data, snapshot=True)
         except Exception:
+            # a sidecar is created if the data is saved
             self._if = None
-            if not self._sc:
-                self.create_side_car()
-        self._unsaved = False
+        # handlers opened from image_data can't be reopened
+        if not image_data:
+            self._pooled = True
+            handler_pool.use(self)
+
+    def _close_handlers(self):
+        # called by handler_pool, all fields have already been read
+        self._sc = None
+        self._if = None
+        self._handlers_open = False
 
     def _find_side_car(self, path):
-        for base in (os.path.splitext(path)[0], path):
-            for ext in ('.xmp', '.XMP'):
-                result = base + ext
-                if os.path.exists(result):
-                    return result
-        return None
+        return sidecar_index.find(path)
 
     def create_side_car(self):
         self._sc_path = self._path + '.xmp'
@@ -835,16 +1503,41 @@ class Metadata(QtCore.QObject):
             of.write('<x:xmpmeta x:xmptk="XMP Core 4.4.0-Exiv2" ')
             of.write('xmlns:x="adobe:ns:meta/">\n')
             of.write('</x:xmpmeta>')
-        self._sc = MetadataHandler(self._sc_path)
+        sidecar_index.add(self._sc_path)
+        self._sc = MetadataHandler(self._sc_path, snapshot=True)
         if self._if:
             self._sc.copy(self._if, comment=False)
 
-    def save(self, if_mode, sc_mode, force_iptc):
+    def _field_tags(self, name):
+        # all tags used to store a data field
+        result = set()
+        tags = list(self._primary_tags[name].values())
+        for family in self._secondary_tags[name]:
+            tags += self._secondary_tags[name][family]
+        for tag in tags:
+            result.add(tag)
+            result.update(x for x in _sub_tags.get(tag, ()) if x)
+        return result
+
+    def save(self, if_mode, sc_mode, force_iptc, batch=None):
         if not self._unsaved:
             return
+        # don't let handler_pool close handlers while they're in use
+        handler_pool.pin(self)
+        try:
+            self._save(if_mode, sc_mode, force_iptc, batch)
+        finally:
+            handler_pool.unpin(self)
+
+    def _save(self, if_mode, sc_mode, force_iptc, batch):
+        self._open_handlers()
+        if not (self._if or self._sc):
+            # image file metadata can't be read, so use a sidecar
+            self.create_side_car()
         self.software = 'Photini editor v' + __version__
         save_iptc = force_iptc or self.has_iptc()
-        for name in self._primary_tags:
+        # only write fields that have changed
+        for name in self._dirty:
             value = getattr(self, name)
             # write data to primary tags
             for family in self._primary_tags[name]:
@@ -855,19 +1548,50 @@ class Metadata(QtCore.QObject):
                 for tag in self._secondary_tags[name][family]:
                     self.set_value(tag, None)
         if self._if and sc_mode == 'delete' and self._sc:
-            self._if.copy(self._sc, comment=False)
+            # copy sidecar data to image, unless it has all just been
+            # written to the image
+            written = set()
+            for name in self._dirty:
+                written |= self._field_tags(name)
+            sc_tags = (self._sc.get_exif_tags() + self._sc.get_iptc_tags() +
+                       self._sc.get_xmp_tags())
+            if not written.issuperset(sc_tags):
+                self._if.copy(self._sc, comment=False)
+        # with a batch, files aren't saved until it's committed
+        on_failure = None
+        if batch:
+            saved_fields = set(self._dirty)
+            sc_path = self._sc_path
+            def on_failure():
+                # sidecar won't have been deleted
+                if sc_path:
+                    sidecar_index.add(sc_path)
+                    if not self._sc_path:
+                        self._sc_path = sc_path
+                        self._close_handlers()
+                self._dirty |= saved_fields
+                self._set_unsaved(True)
         OK = False
         if self._if and if_mode:
-            OK = self._if.save()
+            OK = self._if.save(batch, on_failure)
         if sc_mode == 'delete' and self._sc and OK:
-            os.unlink(self._sc_path)
+            if batch:
+                batch.unlink(self._sc_path, self._path)
+            else:
+                os.unlink(self._sc_path)
+            sidecar_index.remove(self._sc_path)
             self._sc = None
+            self._sc_path = None
         if sc_mode == 'auto' and not self._sc and not OK:
             self.create_side_car()
         if sc_mode == 'always' and not self._sc:
             self.create_side_car()
         if self._sc:
-            OK = self._sc.save()
+            OK = self._sc.save(batch, on_failure)
+        if self._cache:
+            self._cache.invalidate(self._path)
+        if OK:
+            self._dirty.clear()
         self._set_unsaved(not OK)
 
     # getters: use sidecar if tag is present, otherwise use image file
@@ -875,31 +1599,38 @@ class Metadata(QtCore.QObject):
         assert(tag in _data_type)
         if _data_type[tag] == Ignore:
             return None
+        self._open_handlers()
+        # another thread may close the handlers at any time
+        sc, if_ = self._sc, self._if
         result = None
-        if self._sc:
-            result = self._sc.get_value(tag)
-        if self._if and not result:
-            result = self._if.get_value(tag)
+        if sc:
+            result = sc.get_value(tag)
+        if if_ and not result:
+            result = if_.get_value(tag)
         return result
 
     def has_iptc(self):
-        if self._sc and self._sc.has_iptc():
+        self._open_handlers()
+        sc, if_ = self._sc, self._if
+        if sc and sc.has_iptc():
             return True
-        if self._if and self._if.has_iptc():
+        if if_ and if_.has_iptc():
             return True
         return False
 
     # setters: set in both sidecar and image file
     def set_value(self, tag, value):
         assert(tag in _data_type)
-        if self._sc:
-            self._sc.set_value(tag, value)
-        if self._if:
-            self._if.set_value(tag, value)
+        self._open_handlers()
+        sc, if_ = self._sc, self._if
+        if sc:
+            sc.set_value(tag, value)
+        if if_:
+            if_.set_value(tag, value)
 
     def __getattr__(self, name):
         if name not in self._primary_tags:
-            return super(Metadata, self).__getattr__(name)
+            raise AttributeError(name)
         # get values from all 3 families
         value = {'Exif': None, 'Iptc': None, 'Xmp': None}
         used_tag = {'Exif': None, 'Iptc': None, 'Xmp': None}
@@ -925,15 +1656,13 @@ class Metadata(QtCore.QObject):
                     used_tag[family] = tag
                 elif value[family].contains(new_value):
                     continue
-                elif value[family].merge(new_value):
-                    self.logger.warning(
-                        '%s: merged %s into %s',
-                        os.path.basename(self._path), tag, used_tag[family])
                 else:
-                    self.logger.warning(
-                        '%s: using %s value "%s", ignoring %s value "%s"',
-                        os.path.basename(self._path), used_tag[family],
-                        str(value[family]), tag, str(new_value))
+                    # merge changes the value, so record a copy of it
+                    used_value = copy.deepcopy(value[family])
+                    merged = value[family].merge(new_value)
+                    self._conflicts.append(Conflict(
+                        name, used_tag[family], used_value,
+                        tag, new_value, merged))
         # choose preferred family
         if value['Exif'] is not None:
             preference = 'Exif'
@@ -948,16 +1677,11 @@ class Metadata(QtCore.QObject):
                 other = value[family]
                 if result.contains(other):
                     continue
-                elif result.merge(other, family):
-                    self.logger.warning(
-                        '%s: merged %s data into %s',
-                        os.path.basename(self._path),
-                        used_tag[family], used_tag[preference])
-                else:
-                    self.logger.warning(
-                        '%s: using %s value "%s", ignoring %s value "%s"',
-                        os.path.basename(self._path), used_tag[preference],
-                        str(result), used_tag[family], str(other))
+                used_value = copy.deepcopy(result)
+                merged = result.merge(other, family)
+                self._conflicts.append(Conflict(
+                    name, used_tag[preference], used_value,
+                    used_tag[family], other, merged))
         # add value to object attributes so __getattr__ doesn't get
         # called again
         super(Metadata, self).__setattr__(name, result)
@@ -975,12 +1699,23 @@ class Metadata(QtCore.QObject):
         if getattr(self, name) == value:
             return
         super(Metadata, self).__setattr__(name, value)
+        # the user's new value resolves any conflict
+        self._conflicts = [x for x in self._conflicts if x.field != name]
+        self._dirty.add(name)
+        for callback in self.field_callbacks:
+            callback(name, value)
         self._set_unsaved(True)
 
-    new_status = QtCore.pyqtSignal(bool)
+    def conflicts(self):
+        """Get a list of Conflict records for all data fields."""
+        for name in self._primary_tags:
+            getattr(self, name)
+        return list(self._conflicts)
+
     def _set_unsaved(self, status):
         self._unsaved = status
-        self.new_status.emit(self._unsaved)
+        for callback in self.status_callbacks:
+            callback(self._unsaved)
 
     def changed(self):
         return self._unsaved
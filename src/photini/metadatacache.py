@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import appdirs
+from six.moves import cPickle as pickle
+
+from . import __version__
+
+# increment this if the format of stored values or the table changes
+_schema = 3
+
+class MetadataCache(object):
+    """Persistent store of resolved metadata values.
+
+    Values are stored per image file and are only returned if the
+    file's size, modification and change times and inode number, and
+    the modification time of its sidecar (if any), are unchanged since
+    they were stored. This allows an unchanged image to be reopened
+    without parsing its metadata again.
+
+    Some file systems (e.g. FAT) only store modification times to the
+    nearest 2 seconds, so a file could be changed again without its
+    time changing. Values are not stored for files modified this
+    recently.
+
+    """
+    # files modified less than this many seconds ago are not cached
+    min_age = 2.0
+    # prune() deletes entries not used for this many seconds
+    max_age = 90 * 24 * 3600
+    # prune() deletes least recently used entries beyond this number
+    max_entries = 50000
+
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not path:
+            path = os.path.join(
+                appdirs.user_cache_dir('photini'), 'metadata.db')
+        self._db_path = path
+        self._connection = None
+        self._pid = None
+        self._uncommitted = 0
+        # path: time of entries used since the last flush
+        self._used = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # a connection can't be shared with a child process
+        if self._connection and self._pid == os.getpid():
+            return self._connection
+        cache_dir = os.path.dirname(self._db_path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self._connection = sqlite3.connect(
+            self._db_path, timeout=10, check_same_thread=False)
+        self._connection.execute('PRAGMA synchronous = OFF')
+        user_version = self._connection.execute(
+            'PRAGMA user_version').fetchone()[0]
+        if user_version != _schema:
+            # old table layout, discard it
+            self._connection.execute('DROP TABLE IF EXISTS metadata')
+            self._connection.execute(
+                'PRAGMA user_version = {:d}'.format(_schema))
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS metadata ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime REAL, ctime REAL, '
+            'inode INTEGER, sc_mtime REAL, version TEXT, used REAL, '
+            'data BLOB)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS metadata_used ON metadata (used)')
+        self._connection.commit()
+        self._pid = os.getpid()
+        self._uncommitted = 0
+        return self._connection
+
+    @staticmethod
+    def file_key(path, sc_path):
+        """Get the values used to check if a cache entry is valid."""
+        stat = os.stat(path)
+        sc_mtime = None
+        if sc_path:
+            sc_mtime = os.stat(sc_path).st_mtime
+        return (stat.st_size, stat.st_mtime, stat.st_ctime, stat.st_ino,
+                sc_mtime)
+
+    def get(self, path, key):
+        """Get stored values if they are still valid, else None."""
+        version = '{}.{}'.format(__version__, _schema)
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    'SELECT size, mtime, ctime, inode, sc_mtime, version, '
+                    'data FROM metadata WHERE path = ?', (path,)).fetchone()
+                if row is None:
+                    return None
+                if tuple(row[:6]) != tuple(key) + (version,):
+                    return None
+                # record use for prune(), but don't start a write
+                # transaction that would block other processes
+                self._used[path] = time.time()
+            return pickle.loads(bytes(row[6]))
+        except Exception as ex:
+            self.logger.exception(ex)
+            return None
+
+    def put(self, path, key, values):
+        size, mtime, ctime, inode, sc_mtime = key
+        now = time.time()
+        if now - max(mtime, sc_mtime or 0) < self.min_age:
+            # file could change again without its mtime changing
+            return
+        version = '{}.{}'.format(__version__, _schema)
+        try:
+            data = sqlite3.Binary(pickle.dumps(values, 2))
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    'INSERT OR REPLACE INTO metadata VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (path, size, mtime, ctime, inode, sc_mtime, version,
+                     now, data))
+                self._uncommitted += 1
+                if self._uncommitted >= 100:
+                    connection.commit()
+                    self._uncommitted = 0
+        except Exception as ex:
+            self.logger.exception(ex)
+
+    def invalidate(self, path):
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    'DELETE FROM metadata WHERE path = ?', (path,))
+                connection.commit()
+                self._uncommitted = 0
+        except Exception as ex:
+            self.logger.exception(ex)
+
+    def prune(self):
+        """Delete entries that haven't been used recently, and the least
+        recently used entries if there are more than max_entries.
+
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                self._write_used(connection)
+                connection.execute(
+                    'DELETE FROM metadata WHERE used < ?',
+                    (time.time() - self.max_age,))
+                connection.execute(
+                    'DELETE FROM metadata WHERE path IN (SELECT path '
+                    'FROM metadata ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,))
+                connection.commit()
+                self._uncommitted = 0
+        except Exception as ex:
+            self.logger.exception(ex)
+
+    def _write_used(self, connection):
+        if not self._used:
+            return
+        connection.executemany(
+            'UPDATE metadata SET used = ? WHERE path = ?',
+            [(used, path) for path, used in self._used.items()])
+        self._used = {}
+
+    def flush(self):
+        if not (self._uncommitted or self._used):
+            return
+        try:
+            with self._lock:
+                connection = self._connect()
+                self._write_used(connection)
+                connection.commit()
+                self._uncommitted = 0
+        except Exception as ex:
+            self.logger.exception(ex)
+
+
+# one MetadataCache object for the entire application
+metadata_cache = MetadataCache()
@@ -27,8 +27,11 @@ import webbrowser
 import six
 
 from .configstore import data_dir
+from .gpx import TrackLog
 from .imagelist import DRAG_MIMETYPE
-from .pyqt import multiple_values, Qt, QtCore, QtGui, QtWebKitWidgets, QtWidgets
+from .pyqt import (
+    Busy, multiple_values, Qt, QtCore, QtGui, QtWebKitWidgets, QtWidgets,
+    qt_version_info)
 from . import __version__
 
 translate = QtCore.QCoreApplication.translate
@@ -70,6 +73,51 @@ class WebView(QtWebKitWidgets.QWebView):
             self.drop_text.emit(event.pos().x(), event.pos().y(), text)
 
 
+class GpxDialog(QtWidgets.QDialog):
+    def __init__(self, config_store, *arg, **kw):
+        super(GpxDialog, self).__init__(*arg, **kw)
+        self.config_store = config_store
+        self.setWindowTitle(translate('PhotiniMap', 'Photini: GPX settings'))
+        self.setLayout(QtWidgets.QVBoxLayout())
+        form = QtWidgets.QFormLayout()
+        self.layout().addLayout(form)
+        # camera clock offset
+        self.clock_offset = QtWidgets.QSpinBox()
+        self.clock_offset.setRange(-15 * 3600, 15 * 3600)
+        self.clock_offset.setSuffix(translate('PhotiniMap', ' s'))
+        self.clock_offset.setToolTip(translate(
+            'PhotiniMap', 'Seconds the camera clock is ahead of UTC. Include'
+            ' the time zone if the camera does not record it.'))
+        self.clock_offset.setValue(
+            eval(self.config_store.get('gpx', 'clock_offset', '0')))
+        form.addRow(translate('PhotiniMap', 'Camera clock offset'),
+                    self.clock_offset)
+        # maximum gap
+        self.max_gap = QtWidgets.QSpinBox()
+        self.max_gap.setRange(0, 24 * 3600)
+        self.max_gap.setSuffix(translate('PhotiniMap', ' s'))
+        self.max_gap.setSpecialValueText(translate('PhotiniMap', 'no limit'))
+        self.max_gap.setToolTip(translate(
+            'PhotiniMap', 'Do not interpolate between track points further'
+            ' apart than this.'))
+        self.max_gap.setValue(
+            eval(self.config_store.get('gpx', 'max_gap', '300')))
+        form.addRow(translate('PhotiniMap', 'Maximum gap'), self.max_gap)
+        # OK & cancel buttons
+        button_box = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        self.layout().addWidget(button_box)
+
+    def get_values(self):
+        clock_offset = self.clock_offset.value()
+        max_gap = self.max_gap.value()
+        self.config_store.set('gpx', 'clock_offset', str(clock_offset))
+        self.config_store.set('gpx', 'max_gap', str(max_gap))
+        return clock_offset, max_gap or None
+
+
 class PhotiniMap(QtWidgets.QWidget):
     def __init__(self, config_store, image_list, parent=None):
         super(PhotiniMap, self).__init__(parent)
@@ -119,6 +167,12 @@ class PhotiniMap(QtWidgets.QWidget):
         self.coords.editingFinished.connect(self.new_coords)
         self.coords.setEnabled(False)
         self.layout().addWidget(self.coords, 3, 0)
+        # GPX track log
+        self.gpx_button = QtWidgets.QPushButton(
+            translate('PhotiniMap', 'Set from GPX file'))
+        self.gpx_button.clicked.connect(self.load_gpx)
+        self.gpx_button.setEnabled(False)
+        self.layout().addWidget(self.gpx_button, 4, 0)
         # load map button
         self.load_map = QtWidgets.QPushButton(translate('PhotiniMap', '\nLoad map\n'))
         self.load_map.clicked.connect(self.initialise)
@@ -241,6 +295,50 @@ class PhotiniMap(QtWidgets.QWidget):
         self.display_coords()
         self.see_selection()
 
+    @QtCore.pyqtSlot()
+    def load_gpx(self):
+        images = self.image_list.get_selected_images()
+        if not images:
+            return
+        path_list = QtWidgets.QFileDialog.getOpenFileNames(
+            self, translate('PhotiniMap', 'Open GPX files'),
+            self.config_store.get('paths', 'gpx', ''),
+            translate('PhotiniMap', 'GPS track logs (*.gpx);;All files (*)'))
+        if qt_version_info >= (5, 0):
+            path_list = path_list[0]
+        if not path_list:
+            return
+        self.config_store.set('paths', 'gpx', os.path.dirname(path_list[0]))
+        dialog = GpxDialog(self.config_store, parent=self)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        clock_offset, max_gap = dialog.get_values()
+        track_log = TrackLog()
+        count = 0
+        with Busy():
+            for path in path_list:
+                try:
+                    track_log.load(path)
+                except Exception as ex:
+                    QtWidgets.QMessageBox.warning(
+                        self, translate('PhotiniMap', 'GPX file error'),
+                        '{}: {}'.format(os.path.basename(path), str(ex)))
+            for image in images:
+                position = track_log.image_position(
+                    image.metadata.date_taken, clock_offset=clock_offset,
+                    max_gap=max_gap)
+                if position:
+                    self._set_metadata(image, *position)
+                    count += 1
+            if count:
+                self.new_images()
+        self.display_coords()
+        self.see_selection()
+        QtWidgets.QMessageBox.information(
+            self, translate('PhotiniMap', 'Photini: GPX'),
+            translate('PhotiniMap', 'Set location of {0:d} of {1:d} images.'
+                      ).format(count, len(images)))
+
     def see_all(self):
         self._see_markers(self.image_list.get_images())
 
@@ -277,8 +375,10 @@ class PhotiniMap(QtWidgets.QWidget):
     def new_selection(self, selection):
         if selection:
             self.coords.setEnabled(True)
+            self.gpx_button.setEnabled(True)
         else:
             self.coords.setEnabled(False)
+            self.gpx_button.setEnabled(False)
         for marker_id in self.marker_images:
             self.JavaScript('enableMarker("{}", {:d})'.format(
                 marker_id,
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import bisect
+from collections import defaultdict
+import re
+import threading
+
+import six
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+class SearchIndex(object):
+    """Inverted index of the words in some text metadata fields.
+
+    The index is updated as values change, so searches don't need to
+    read any metadata. A query is a list of space separated terms, all
+    of which must match. A term can be:
+
+    word        any indexed field has a word starting with "word"
+    field:word  the named field has a word starting with "word"
+    field:*     the named field has a value
+    -term       the term does not match
+
+    e.g. "keywords:cat -title:*" finds images with a keyword starting
+    with "cat" and no title.
+
+    """
+    fields = ('title', 'description', 'keywords', 'creator', 'camera_model')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # (field, word) -> set of paths
+            self._postings = defaultdict(set)
+            # field -> set of paths with a value
+            self._present = defaultdict(set)
+            # path -> {field: set of words}
+            self._words = {}
+            # sorted list of all words, for prefix matching
+            self._vocabulary = None
+
+    @staticmethod
+    def split(value):
+        if not value:
+            return set()
+        return set(_word_re.findall(six.text_type(value).lower()))
+
+    def add(self, path, metadata):
+        for field in self.fields:
+            self.update_field(path, field, getattr(metadata, field))
+
+    def update_field(self, path, field, value):
+        if field not in self.fields:
+            return
+        words = self.split(value)
+        with self._lock:
+            doc = self._words.setdefault(path, {})
+            old_words = doc.get(field, set())
+            for word in old_words - words:
+                paths = self._postings[field, word]
+                paths.discard(path)
+                if not paths:
+                    del self._postings[field, word]
+                    self._vocabulary = None
+            for word in words - old_words:
+                if (field, word) not in self._postings:
+                    self._vocabulary = None
+                self._postings[field, word].add(path)
+            doc[field] = words
+            if value:
+                self._present[field].add(path)
+            else:
+                self._present[field].discard(path)
+
+    def remove(self, path):
+        for field in self.fields:
+            self.update_field(path, field, None)
+        with self._lock:
+            del self._words[path]
+
+    def _prefix_matches(self, fields, prefix):
+        # all paths with a word in one of fields starting with prefix
+        if self._vocabulary is None:
+            self._vocabulary = sorted(set(x[1] for x in self._postings))
+        result = set()
+        idx = bisect.bisect_left(self._vocabulary, prefix)
+        while (idx < len(self._vocabulary) and
+               self._vocabulary[idx].startswith(prefix)):
+            word = self._vocabulary[idx]
+            for field in fields:
+                result |= self._postings.get((field, word), set())
+            idx += 1
+        return result
+
+    def search(self, query):
+        """Get the set of paths matching query, or None if query is
+        empty."""
+        result = None
+        with self._lock:
+            for term in query.split():
+                negate = term.startswith('-') and len(term) > 1
+                if negate:
+                    term = term[1:]
+                field, sep, text = term.partition(':')
+                if sep and field in self.fields:
+                    fields = (field,)
+                else:
+                    fields = self.fields
+                    text = term
+                if text in ('', '*'):
+                    matches = set()
+                    for field in fields:
+                        matches |= self._present[field]
+                else:
+                    matches = None
+                    for word in self.split(text):
+                        word_matches = self._prefix_matches(fields, word)
+                        if matches is None:
+                            matches = word_matches
+                        else:
+                            matches &= word_matches
+                    if matches is None:
+                        # term has no words, e.g. punctuation
+                        continue
+                if negate:
+                    if result is None:
+                        result = set(self._words)
+                    result -= matches
+                elif result is None:
+                    result = matches
+                else:
+                    result &= matches
+        return result
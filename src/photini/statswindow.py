@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import os
+
+from .configstore import data_dir
+from .instrument import instrument
+from .pyqt import Qt, QtGui, QtWidgets, qt_version_info
+
+class StatisticsWindow(QtWidgets.QWidget):
+    def __init__(self, config_store, parent=None):
+        super(StatisticsWindow, self).__init__(parent)
+        self.config_store = config_store
+        self.setWindowFlags(Qt.Window)
+        self.setWindowTitle(self.tr('Photini: metadata statistics'))
+        self.setWindowIcon(QtGui.QIcon(os.path.join(data_dir, 'icon_48.png')))
+        self.setLayout(QtWidgets.QGridLayout())
+        self.layout().setRowStretch(1, 1)
+        self.layout().setColumnStretch(0, 1)
+        # enable / disable
+        self.record = QtWidgets.QCheckBox(self.tr('Record statistics'))
+        self.record.setChecked(instrument.enabled())
+        self.record.clicked.connect(self.set_recording)
+        self.layout().addWidget(self.record, 0, 0, 1, 4)
+        # results table
+        self.table = QtWidgets.QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels([
+            self.tr('Operation'), self.tr('Family'), self.tr('Calls'),
+            self.tr('Total (ms)'), self.tr('Mean (us)')])
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.setMinimumWidth(600)
+        self.layout().addWidget(self.table, 1, 0, 1, 4)
+        # buttons
+        refresh_button = QtWidgets.QPushButton(self.tr('Refresh'))
+        refresh_button.clicked.connect(self.refresh)
+        self.layout().addWidget(refresh_button, 2, 0, Qt.AlignLeft)
+        reset_button = QtWidgets.QPushButton(self.tr('Reset'))
+        reset_button.clicked.connect(self.reset)
+        self.layout().addWidget(reset_button, 2, 1)
+        save_button = QtWidgets.QPushButton(self.tr('Save JSON'))
+        save_button.clicked.connect(self.save)
+        self.layout().addWidget(save_button, 2, 2)
+        dismiss_button = QtWidgets.QPushButton(self.tr('Dismiss'))
+        dismiss_button.clicked.connect(self.hide)
+        self.layout().addWidget(dismiss_button, 2, 3)
+
+    def showEvent(self, event):
+        self.refresh()
+        super(StatisticsWindow, self).showEvent(event)
+
+    def set_recording(self, checked):
+        if checked:
+            instrument.enable()
+        else:
+            instrument.disable()
+
+    def refresh(self):
+        results = instrument.results()
+        self.table.setRowCount(len(results))
+        for row, (operation, family, count, seconds) in enumerate(results):
+            for column, text in enumerate((
+                    operation, family, '{:d}'.format(count),
+                    '{:.1f}'.format(seconds * 1.0e3),
+                    '{:.1f}'.format(seconds * 1.0e6 / count))):
+                item = QtWidgets.QTableWidgetItem(text)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+
+    def reset(self):
+        instrument.reset()
+        self.refresh()
+
+    def save(self):
+        path = QtWidgets.QFileDialog.getSaveFileName(
+            self, self.tr('Save statistics'),
+            os.path.join(self.config_store.get('paths', 'statistics', ''),
+                         'photini_statistics.json'),
+            self.tr('JSON files (*.json);;All files (*)'))
+        if qt_version_info >= (5, 0):
+            path = path[0]
+        if not path:
+            return
+        self.config_store.set('paths', 'statistics', os.path.dirname(path))
+        instrument.dump(path)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+
+import appdirs
+import six
+from six.moves.urllib.parse import quote
+
+from . import __version__
+from .metadata import replace_file
+from .pyqt import QtCore, QtGui
+
+class ThumbnailStore(object):
+    """Persistent store of thumbnail images.
+
+    This follows the freedesktop.org thumbnail specification
+    (https://specifications.freedesktop.org/thumbnail-spec/) so on
+    Linux the thumbnails are shared with file managers and other
+    programs. Each thumbnail is a PNG file named with the MD5 hash of
+    the image's URI, and is only used if the image's modification time
+    matches the one stored in the thumbnail.
+
+    Thumbnails are stored in the orientation the image is displayed
+    in. Photini records the orientation it used so its thumbnails can
+    be rejected if the image's orientation has been changed in a
+    sidecar. Other programs' thumbnails don't record this, so callers
+    shouldn't use get() for images with unsaved changes.
+
+    The store may be shared, so Photini keeps an index of the
+    thumbnails it has written and tidy() only deletes those.
+
+    """
+    # (name, size) of each thumbnail directory, smallest first
+    sizes = (('normal', 128), ('large', 256))
+    # tidy() deletes least recently used thumbnails beyond this
+    size_limit = 256 * 1024 * 1024
+
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if path:
+            index_path = os.path.join(path, 'photini.index')
+        else:
+            cache_dir = appdirs.user_cache_dir('photini')
+            index_path = os.path.join(cache_dir, 'thumbnails.index')
+            if sys.platform.startswith('win') or sys.platform == 'darwin':
+                path = os.path.join(cache_dir, 'thumbnails')
+            else:
+                # share with other programs
+                path = os.path.join(appdirs.user_cache_dir(), 'thumbnails')
+        self._root = os.path.abspath(path)
+        self._index_path = index_path
+        # index entries written this session
+        self._indexed = set()
+        self._lock = threading.Lock()
+
+    def _size_name(self, size):
+        for name, max_size in self.sizes:
+            if size <= max_size:
+                return name, max_size
+        return self.sizes[-1]
+
+    def _thumb_path(self, uri, name):
+        return os.path.join(
+            self._root, name, hashlib.md5(uri).hexdigest() + '.png')
+
+    @staticmethod
+    def uri(path):
+        """Convert an absolute path to a file URI, escaped the same way
+        as GLib's g_filename_to_uri so the thumbnail file names match
+        those used by other programs.
+
+        """
+        if isinstance(path, six.text_type):
+            path = path.encode(sys.getfilesystemencoding())
+        if os.sep != '/':
+            path = path.replace(os.sep.encode('ascii'), b'/')
+            if not path.startswith(b'/'):
+                path = b'/' + path
+        return b'file://' + quote(path, safe=b"/!$&'()*+,:=@~").encode('ascii')
+
+    def get(self, path, size, orientation):
+        """Get a thumbnail that fits in a size x size square, or None
+        if there isn't a valid one.
+
+        """
+        path = os.path.abspath(path)
+        uri = self.uri(path)
+        name, max_size = self._size_name(size)
+        thumb_path = self._thumb_path(uri, name)
+        if not os.path.exists(thumb_path):
+            return None
+        try:
+            mtime = int(os.stat(path).st_mtime)
+            reader = QtGui.QImageReader(thumb_path)
+            if reader.text('Thumb::URI') != uri.decode('ascii'):
+                return None
+            if reader.text('Thumb::MTime') != str(mtime):
+                return None
+            stored = reader.text('X-Photini-Orientation')
+            if stored and stored != str(orientation or 1):
+                return None
+            image = reader.read()
+        except Exception as ex:
+            self.logger.exception(ex)
+            return None
+        if image.isNull():
+            return None
+        if max(image.width(), image.height()) > size:
+            image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio,
+                                 QtCore.Qt.SmoothTransformation)
+        return image
+
+    def size_for(self, size):
+        """Get the image size needed to store a thumbnail that will be
+        used at size x size.
+
+        """
+        return self._size_name(size)[1]
+
+    def put(self, path, size, image, orientation):
+        """Store a thumbnail that fits in a size x size square, where
+        size was got from size_for().
+
+        """
+        path = os.path.abspath(path)
+        if path.startswith(self._root + os.sep) or image.isNull():
+            return
+        uri = self.uri(path)
+        name, max_size = self._size_name(size)
+        thumb_path = self._thumb_path(uri, name)
+        try:
+            stat = os.stat(path)
+            thumb_dir = os.path.dirname(thumb_path)
+            if not os.path.isdir(thumb_dir):
+                os.makedirs(thumb_dir, 0o700)
+            image = QtGui.QImage(image)
+            image.setText('Thumb::URI', uri.decode('ascii'))
+            image.setText('Thumb::MTime', str(int(stat.st_mtime)))
+            image.setText('Thumb::Size', str(stat.st_size))
+            image.setText('Software', 'Photini ' + __version__)
+            image.setText('X-Photini-Orientation', str(orientation or 1))
+            # write to a temporary file then rename, so other
+            # programs never see a partly written thumbnail
+            temp_path = '{}.{}.{}'.format(
+                thumb_path, os.getpid(), threading.current_thread().ident)
+            if not image.save(temp_path, 'PNG'):
+                self.logger.warning('Cannot write thumbnail %s', thumb_path)
+                return
+            os.chmod(temp_path, 0o600)
+            replace_file(temp_path, thumb_path)
+            index_name = os.path.join(name, os.path.basename(thumb_path))
+            with self._lock:
+                if index_name in self._indexed:
+                    return
+                index_dir = os.path.dirname(self._index_path)
+                if not os.path.isdir(index_dir):
+                    os.makedirs(index_dir)
+                with open(self._index_path, 'a') as index:
+                    index.write(index_name + '\n')
+                self._indexed.add(index_name)
+        except Exception as ex:
+            self.logger.exception(ex)
+
+    def start_tidy(self):
+        """Run tidy() in a background thread."""
+        thread = threading.Thread(target=self.tidy)
+        thread.daemon = True
+        thread.start()
+
+    def tidy(self):
+        """Delete the least recently used thumbnails written by Photini
+        until they take up less than size_limit. Thumbnails written by
+        other programs are left alone.
+
+        """
+        with self._lock:
+            try:
+                self._tidy()
+            except Exception as ex:
+                self.logger.exception(ex)
+
+    def _tidy(self):
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path) as index:
+            names = set(index.read().split())
+        files = []
+        total = 0
+        for name in names:
+            file_path = os.path.join(self._root, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # already deleted, e.g. by another program
+                continue
+            files.append(
+                (max(stat.st_atime, stat.st_mtime), stat.st_size, name))
+            total += stat.st_size
+        files.sort()
+        while files and total > self.size_limit:
+            used, file_size, name = files.pop(0)
+            try:
+                os.remove(os.path.join(self._root, name))
+            except OSError as ex:
+                self.logger.warning(str(ex))
+                continue
+            total -= file_size
+        # rewrite index with the remaining thumbnails
+        temp_path = self._index_path + '.tmp'
+        with open(temp_path, 'w') as index:
+            for used, file_size, name in files:
+                index.write(name + '\n')
+        if os.path.exists(self._index_path):
+            os.remove(self._index_path)
+        os.rename(temp_path, self._index_path)
+
+
+# one ThumbnailStore object for the entire application
+thumbnail_store = ThumbnailStore()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+import random
+import unittest
+
+try:
+    from photini.metadata import DateTime
+except ImportError as ex:
+    DateTime = None
+    reason = str(ex)
+else:
+    reason = ''
+
+def reference_ISO_8601(date_string, time_string):
+    # the parser used by Photini before the fast path was added
+    tz_offset = None
+    if time_string:
+        if time_string[-1] == 'Z':
+            time_string = time_string[:-1]
+            zone_string = '0000'
+            zone_sign = '+'
+        else:
+            time_string, zone_sign, zone_string = time_string.partition('+')
+            if not zone_string:
+                time_string, zone_sign, zone_string = time_string.partition('-')
+        if zone_string:
+            zone_string += '  00'[len(zone_string):]
+            tz_offset = (int(zone_string[:2]) * 60) + int(zone_string[2:])
+            if zone_sign == '-':
+                tz_offset = -tz_offset
+    datetime_string = date_string + time_string
+    precision = min((len(datetime_string) - 2) // 2, 6)
+    if precision <= 0:
+        return None
+    if precision == 6 and datetime_string.count('.') > 0:
+        precision = 7
+    fmt = ''.join(DateTime.basic_fmt[:precision])
+    return DateTime(
+        datetime.strptime(datetime_string, fmt), precision, tz_offset)
+
+def random_inputs(rng):
+    """Generate (date_string, time_string) pairs, mostly near-valid."""
+    digits = '0123456789'
+    noise = digits + '.+-Z: T٣'
+    while True:
+        when = datetime(rng.randint(1, 9999), rng.randint(1, 12),
+                        rng.randint(1, 28), rng.randint(0, 23),
+                        rng.randint(0, 59), rng.randint(0, 59),
+                        rng.randint(0, 999999))
+        date_string = when.strftime('%Y%m%d')[:rng.choice((0, 2, 4, 6, 8))]
+        time_string = when.strftime('%H%M%S.%f')[:rng.randint(0, 13)]
+        if rng.random() < 0.3:
+            time_string += rng.choice(
+                ('Z', '+', '-')) + ''.join(rng.choice(digits)
+                                           for i in range(rng.randint(0, 4)))
+        if rng.random() < 0.3:
+            # corrupt or extend one of the strings
+            chars = list(rng.choice((date_string, time_string)))
+            pos = rng.randint(0, len(chars))
+            if chars and rng.random() < 0.5:
+                chars[min(pos, len(chars) - 1)] = rng.choice(noise)
+            else:
+                chars.insert(pos, rng.choice(noise))
+            if rng.random() < 0.5:
+                date_string = ''.join(chars)
+            else:
+                time_string = ''.join(chars)
+        yield date_string, time_string
+
+def outcome(func, args):
+    try:
+        result = func(*args)
+    except Exception as ex:
+        return type(ex).__name__
+    if result is None:
+        return None
+    value = result.value
+    return (value['datetime'], value['precision'], value['tz_offset'])
+
+
+@unittest.skipIf(DateTime is None, reason)
+class TestISO8601(unittest.TestCase):
+    def test_equivalence(self):
+        # fast path and memo must give the same results and exceptions
+        # as strptime, over many random inputs
+        inputs = random_inputs(random.Random(1))
+        for i in range(20000):
+            args = next(inputs)
+            expected = outcome(reference_ISO_8601, args)
+            # call twice, to check memoised results as well
+            for n in range(2):
+                self.assertEqual(
+                    outcome(DateTime.from_ISO_8601, args), expected,
+                    msg=repr(args))
+
+    def test_memo_size(self):
+        for year in range(1000, 5000):
+            DateTime.from_ISO_8601('{:d}0101'.format(year), '')
+        self.assertEqual(len(DateTime._ISO_8601_memo), 2000)
+        # most recently used are kept
+        self.assertIn(('49990101', ''), DateTime._ISO_8601_memo)
+
+
+if __name__ == '__main__':
+    unittest.main()
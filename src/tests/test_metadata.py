@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+from __future__ import unicode_literals
+
+import logging
+import unittest
+
+import six
+
+try:
+    from photini.metadata import Metadata, MultiString, String
+except ImportError as ex:
+    Metadata = None
+    reason = str(ex)
+else:
+    reason = ''
+
+    class TagMetadata(Metadata):
+        # reads tag values from a dict instead of an image file
+        def __init__(self, tags):
+            self.logger = logging.getLogger(self.__class__.__name__)
+            self._conflicts = []
+            self._tags = tags
+
+        def get_value(self, tag):
+            return self._tags.get(tag)
+
+
+@unittest.skipIf(Metadata is None, reason)
+class TestConflicts(unittest.TestCase):
+    def conflicts(self, md, name):
+        getattr(md, name)
+        return [(x.used_tag, six.text_type(x.used_value), x.other_tag,
+                 six.text_type(x.other_value)) for x in md.conflicts()]
+
+    def test_string(self):
+        md = TagMetadata({
+            'Exif.Image.ImageDescription' : String('A'),
+            'Xmp.dc.description'          : String('B'),
+            'Xmp.tiff.ImageDescription'   : String('D'),
+            'Iptc.Application2.Caption'   : String('C'),
+            })
+        self.assertEqual(six.text_type(md.description), 'A // B // D // C')
+        # used values are as they were before each merge
+        self.assertEqual(self.conflicts(md, 'description'), [
+            ('Xmp.dc.description', 'B', 'Xmp.tiff.ImageDescription', 'D'),
+            ('Exif.Image.ImageDescription', 'A',
+             'Xmp.dc.description', 'B // D'),
+            ('Exif.Image.ImageDescription', 'A // B // D',
+             'Iptc.Application2.Caption', 'C'),
+            ])
+
+    def test_multi_string(self):
+        md = TagMetadata({
+            'Exif.Image.Artist'         : MultiString('A'),
+            'Xmp.dc.creator'            : MultiString('B'),
+            'Iptc.Application2.Byline'  : MultiString('C'),
+            })
+        self.assertEqual(self.conflicts(md, 'creator'), [
+            ('Exif.Image.Artist', 'A', 'Xmp.dc.creator', 'B'),
+            ('Exif.Image.Artist', 'A; B', 'Iptc.Application2.Byline', 'C'),
+            ])
+
+
+if __name__ == '__main__':
+    unittest.main()
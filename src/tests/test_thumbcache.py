@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2015  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from photini.thumbcache import ThumbnailStore
+except ImportError as ex:
+    ThumbnailStore = None
+    reason = str(ex)
+else:
+    reason = ''
+
+
+@unittest.skipIf(ThumbnailStore is None, reason)
+class TestThumbnailStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = ThumbnailStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_uri(self):
+        # expected values are from GLib's g_filename_to_uri
+        for path, uri in (
+                ('/home/jim/a b.jpg', b'file:///home/jim/a%20b.jpg'),
+                ('/tmp/\xe7\xe9#;[x].jpg',
+                 b'file:///tmp/%C3%A7%C3%A9%23%3B%5Bx%5D.jpg'),
+                ('/x/日本 語.NEF',
+                 b'file:///x/%E6%97%A5%E6%9C%AC%20%E8%AA%9E.NEF'),
+                ("/x/it's+(1),&=@~!$*.png",
+                 b"file:///x/it's+(1),&=@~!$*.png"),
+                ('/x/%41?.jpg', b'file:///x/%2541%3F.jpg'),
+                ):
+            self.assertEqual(ThumbnailStore.uri(path), uri)
+
+    def test_tidy(self):
+        # only thumbnails in Photini's index are deleted, oldest first
+        thumb_dir = os.path.join(self.root, 'normal')
+        os.makedirs(thumb_dir)
+        for n in range(10):
+            path = os.path.join(thumb_dir, '{}.png'.format(n))
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1000)
+            os.utime(path, (n, n))
+        with open(os.path.join(self.root, 'photini.index'), 'w') as index:
+            for n in range(2, 10):
+                index.write('normal/{}.png\n'.format(n))
+        self.store.size_limit = 4500
+        self.store.tidy()
+        self.assertEqual(sorted(os.listdir(thumb_dir)),
+                         ['0.png', '1.png', '6.png', '7.png', '8.png', '9.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()